@@ -0,0 +1,7 @@
+from .exporter import aflush, flush, shutdown
+
+__all__ = [
+    "aflush",
+    "flush",
+    "shutdown"
+]
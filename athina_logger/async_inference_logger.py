@@ -0,0 +1,96 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Union
+
+from .api_key import AthinaApiKey
+from .async_request_helper import AsyncRequestHelper
+from .constants import API_BASE_URL
+from .exporter import BackgroundExporter
+from .inference_logger import InferenceLogger
+
+
+class AsyncInferenceLogger(AthinaApiKey):
+    """
+    class for logging inferences from asyncio applications.
+
+    sends are scheduled as tasks on the caller's running event loop and share the
+    loop's connection pool, so no thread or event loop is created per log. the number of
+    pending sends per loop is bounded like the exporter queue, see BackgroundExporter.schedule.
+    await flush() or athina_logger.aflush() before the loop is closed, sends still pending
+    when it is closed are dropped.
+    """
+
+    @staticmethod
+    async def log_inference(
+            prompt: Optional[Union[List[Dict[str, Any]], Dict[str, Any], str]] = None,
+            response: Optional[Any] = None,
+            prompt_slug: Optional[str] = None,
+            language_model_id: Optional[str] = None,
+            environment: Optional[str] = 'production',
+            functions: Optional[List[Dict]] = None,
+            function_call_response: Optional[Any] = None,
+            tools: Optional[Any] = None,
+            tool_calls: Optional[Any] = None,
+            external_reference_id: Optional[str] = None,
+            customer_id: Optional[str] = None,
+            customer_user_id: Optional[str] = None,
+            session_id: Optional[str] = None,
+            user_query: Optional[str] = None,
+            prompt_tokens: Optional[int] = None,
+            completion_tokens: Optional[int] = None,
+            total_tokens: Optional[int] = None,
+            response_time: Optional[int] = None,
+            context: Optional[Dict] = None,
+            expected_response: Optional[str] = None,
+            custom_attributes: Optional[Dict] = None,
+            custom_eval_metrics: Optional[Dict] = None,
+            cost: Optional[float] = None,
+            model_options: Optional[dict] = None,
+            time_to_first_token: Optional[float] = None,
+            stream_duration: Optional[float] = None,
+            tokens_per_second: Optional[float] = None,
+            inter_chunk_latency: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """
+            logs prompt run data to athina from a running event loop.
+
+            the send is scheduled as a task on the running loop and this coroutine returns
+            immediately, without waiting for the request. takes the same parameters as
+            InferenceLogger.log_inference.
+
+            Returns:
+            - None: The method does not return any value.
+
+            Raises:
+            - None: errors are suppressed and printed.
+            """
+        try:
+            payload = InferenceLogger._build_inference_payload(
+                prompt, response, prompt_slug, language_model_id, environment, functions, function_call_response, tools,
+                tool_calls, external_reference_id, customer_id, customer_user_id, session_id, user_query, prompt_tokens,
+                completion_tokens, total_tokens, response_time, context, expected_response, custom_attributes, cost,
+                custom_eval_metrics, model_options, time_to_first_token, stream_duration, tokens_per_second,
+                inter_chunk_latency)
+            AsyncInferenceLogger.schedule(AsyncRequestHelper.make_post_request(
+                endpoint=f'{API_BASE_URL}/api/v1/log/inference',
+                payload=payload,
+                headers={
+                    'athina-api-key': AsyncInferenceLogger.get_api_key(),
+                },
+            ))
+        except Exception as e:
+            print("Error in logging inference to Athina: ", str(e))
+
+    @staticmethod
+    def schedule(coroutine) -> asyncio.Task:
+        """
+        runs a send coroutine as a task on the running loop, tracked by the background exporter.
+        """
+        return BackgroundExporter.get_instance().schedule(coroutine)
+
+    @staticmethod
+    async def flush(timeout: Optional[float] = None) -> bool:
+        """
+        waits for the sends scheduled on the running loop and the records queued on the background
+        exporter to be sent. returns False if some of them were still pending when the timeout expired.
+        """
+        return await BackgroundExporter.get_instance().aflush(timeout)
@@ -0,0 +1,76 @@
+import asyncio
+import weakref
+from typing import Optional
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from .constants import HTTP_CONNECT_TIMEOUT, HTTP_POOL_SIZE, HTTP_READ_TIMEOUT
+from .request_helper import RequestHelper
+
+
+class AsyncRequestHelper:
+    """
+    class to make requests to the athina api from asyncio code
+
+    every event loop gets one shared httpx.AsyncClient, so all sends scheduled on
+    a loop reuse the same keep-alive connection pool. retries and compression follow
+    the same settings as RequestHelper.
+    """
+    _clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]' = weakref.WeakKeyDictionary()
+    _pool_size = HTTP_POOL_SIZE
+    _timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+    @classmethod
+    def get_client(cls) -> 'httpx.AsyncClient':
+        """
+        returns the async client of the running event loop, creating it on first use.
+        """
+        if httpx is None:
+            raise ImportError('httpx is required for async logging, install it with `pip install athina-logger[async]`')
+        loop = asyncio.get_running_loop()
+        client = cls._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=cls._pool_size, max_keepalive_connections=cls._pool_size),
+                timeout=httpx.Timeout(cls._timeout[1], connect=cls._timeout[0]),
+            )
+            cls._clients[loop] = client
+        return client
+
+    @classmethod
+    async def aclose(cls):
+        """
+        closes the async client of the running event loop.
+        """
+        client = cls._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    @staticmethod
+    async def make_post_request(endpoint: str, payload: Optional[dict], headers: dict):
+        client = AsyncRequestHelper.get_client()
+        # requests silently drops headers set to None, httpx rejects them
+        headers = {k: v for k, v in headers.items() if v is not None}
+        data, headers = RequestHelper.prepare_body(payload, None, headers)
+        policy = RequestHelper._retry_policy
+        policy.budget.record_request()
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            try:
+                response = await client.post(endpoint, content=data, headers=headers)
+                if response.status_code == 200 or response.status_code == 201:
+                    return
+                error = RequestHelper.error_from_response(response)
+                retryable = policy.is_retryable_status(response.status_code)
+                retry_after = policy.parse_retry_after(response.headers.get('Retry-After'))
+            except httpx.TransportError as e:
+                error = e
+                retryable = True
+            if not policy.should_retry(attempt, retryable):
+                raise error
+            await asyncio.sleep(policy.backoff(attempt, retry_after))
@@ -0,0 +1,43 @@
+import gzip
+from typing import Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_ENCODINGS = ('none', 'gzip', 'zstd')
+
+
+class BodyCompressor:
+    """
+    compresses encoded request bodies with gzip or zstd before they are sent.
+    bodies below the threshold are sent as is, since compressing them saves too little.
+    """
+
+    def __init__(self, encoding: str = 'none', threshold: int = 1024, level: Optional[int] = None):
+        if encoding not in COMPRESSION_ENCODINGS:
+            raise ValueError(f'compression must be one of {", ".join(COMPRESSION_ENCODINGS)}, got {encoding}')
+        if encoding == 'zstd' and zstandard is None:
+            print("zstandard is not installed, compressing logs to Athina with gzip instead. "
+                  "install it with `pip install zstandard` to use zstd")
+            encoding = 'gzip'
+        self.encoding = encoding
+        self.threshold = threshold
+        self._level = level
+
+    @property
+    def enabled(self) -> bool:
+        return self.encoding != 'none'
+
+    def compress(self, body: bytes) -> Tuple[bytes, Optional[str]]:
+        """
+        returns the body to send and its Content-Encoding, or None if it was left uncompressed.
+        """
+        if not self.enabled or len(body) < self.threshold:
+            return body, None
+        if self.encoding == 'gzip':
+            return gzip.compress(body, compresslevel=self._level if self._level is not None else 6), 'gzip'
+        # ZstdCompressor is not thread safe, so one is created per body
+        compressor = zstandard.ZstdCompressor(level=self._level if self._level is not None else 3)
+        return compressor.compress(body), 'zstd'
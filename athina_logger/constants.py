@@ -9,5 +9,87 @@ OPENAI_MODEL_ENCODINGS = {
     'gpt-3.5-turbo-16k-0613': 'cl100k_base',
     'gpt-4-0613': 'cl100k_base',
     'gpt-4-32k-0613': 'cl100k_base',
+    'gpt-3.5-turbo-instruct': 'cl100k_base',
+    'davinci-002': 'cl100k_base',
+    'babbage-002': 'cl100k_base',
     'text-davinci-003': 'p50k_base',
+    'text-davinci-002': 'p50k_base',
 }
+
+# encodings of openai model families, matched in this order against the model id
+OPENAI_MODEL_FAMILY_ENCODINGS = (
+    ('gpt-5', 'o200k_base'),
+    # o200k_harmony, the same tokens as o200k_base for the text of the messages
+    ('gpt-oss', 'o200k_base'),
+    ('gpt-4o', 'o200k_base'),
+    ('gpt-4.1', 'o200k_base'),
+    ('gpt-4.5', 'o200k_base'),
+    ('gpt-4', 'cl100k_base'),
+    ('gpt-3.5-turbo', 'cl100k_base'),
+    ('gpt-35-turbo', 'cl100k_base'),
+)
+# reasoning models, matched as a prefix of the model id
+OPENAI_REASONING_MODEL_PREFIXES = ('o1', 'o3', 'o4')
+
+# prompts with at least this many characters are tokenized in one batched, multi-threaded call
+TOKEN_COUNT_BATCH_MIN_CHARS = int(os.getenv('ATHINA_TOKEN_COUNT_BATCH_MIN_CHARS') or 64 * 1024)
+TOKEN_COUNT_THREADS = int(os.getenv('ATHINA_TOKEN_COUNT_THREADS') or 8)
+# token counts of this many chat messages are cached, so each turn of a session only tokenizes its new messages
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv('ATHINA_TOKEN_COUNT_CACHE_SIZE') or 4096)
+
+# Background exporter settings
+EXPORTER_MAX_QUEUE_SIZE = int(os.getenv('ATHINA_EXPORTER_MAX_QUEUE_SIZE') or 10000)
+EXPORTER_NUM_WORKERS = int(os.getenv('ATHINA_EXPORTER_NUM_WORKERS') or 2)
+
+# Batching of log records into a single request, disabled unless enabled explicitly
+EXPORTER_BATCHING_ENABLED = (os.getenv('ATHINA_EXPORTER_BATCHING') or 'false').lower() in ('1', 'true', 'yes')
+EXPORTER_MAX_BATCH_SIZE = int(os.getenv('ATHINA_EXPORTER_MAX_BATCH_SIZE') or 100)
+EXPORTER_MAX_BATCH_BYTES = int(os.getenv('ATHINA_EXPORTER_MAX_BATCH_BYTES') or 1024 * 1024)
+EXPORTER_MAX_LINGER_MS = int(os.getenv('ATHINA_EXPORTER_MAX_LINGER_MS') or 200)
+
+# HTTP connection pool settings shared by all requests to the athina api
+HTTP_POOL_SIZE = int(os.getenv('ATHINA_HTTP_POOL_SIZE') or 10)
+HTTP_CONNECT_TIMEOUT = float(os.getenv('ATHINA_HTTP_CONNECT_TIMEOUT') or 5)
+HTTP_READ_TIMEOUT = float(os.getenv('ATHINA_HTTP_READ_TIMEOUT') or 30)
+
+# Max seconds to spend sending queued log records when the process exits
+EXPORTER_SHUTDOWN_TIMEOUT = float(os.getenv('ATHINA_EXPORTER_SHUTDOWN_TIMEOUT') or 5)
+
+# What to do with a new log record when the exporter queue is full:
+# drop_newest, drop_oldest, block (for up to EXPORTER_BLOCK_TIMEOUT seconds) or sample
+EXPORTER_OVERFLOW_POLICY = os.getenv('ATHINA_EXPORTER_OVERFLOW_POLICY') or 'drop_newest'
+EXPORTER_BLOCK_TIMEOUT = float(os.getenv('ATHINA_EXPORTER_BLOCK_TIMEOUT') or 0.1)
+# with the sample policy, records are kept with this probability once the queue is filled past the high watermark
+EXPORTER_SAMPLE_RATE = float(os.getenv('ATHINA_EXPORTER_SAMPLE_RATE') or 0.1)
+EXPORTER_SAMPLE_HIGH_WATERMARK = float(os.getenv('ATHINA_EXPORTER_SAMPLE_HIGH_WATERMARK') or 0.8)
+
+# Retries of failed requests to the athina api
+RETRY_MAX_ATTEMPTS = int(os.getenv('ATHINA_RETRY_MAX_ATTEMPTS') or 3)
+RETRY_BASE_DELAY = float(os.getenv('ATHINA_RETRY_BASE_DELAY') or 0.1)
+RETRY_MAX_DELAY = float(os.getenv('ATHINA_RETRY_MAX_DELAY') or 5)
+RETRY_MAX_RETRY_AFTER = float(os.getenv('ATHINA_RETRY_MAX_RETRY_AFTER') or 30)
+# process-wide retry budget: every request earns this fraction of a retry, plus a small steady allowance per second
+RETRY_BUDGET_RATIO = float(os.getenv('ATHINA_RETRY_BUDGET_RATIO') or 0.1)
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv('ATHINA_RETRY_BUDGET_MIN_PER_SECOND') or 1)
+
+# Optional on-disk spool for log records that could not be sent, disabled unless a directory is set.
+# processes sharing the directory each spool to a subdirectory of their own
+SPOOL_DIR = os.getenv('ATHINA_SPOOL_DIR') or None
+SPOOL_MAX_BYTES = int(os.getenv('ATHINA_SPOOL_MAX_BYTES') or 100 * 1024 * 1024)
+SPOOL_SEGMENT_BYTES = int(os.getenv('ATHINA_SPOOL_SEGMENT_BYTES') or 4 * 1024 * 1024)
+# always, interval or never
+SPOOL_FSYNC = os.getenv('ATHINA_SPOOL_FSYNC') or 'interval'
+SPOOL_FSYNC_INTERVAL = float(os.getenv('ATHINA_SPOOL_FSYNC_INTERVAL') or 1)
+SPOOL_REPLAY_INTERVAL = float(os.getenv('ATHINA_SPOOL_REPLAY_INTERVAL') or 5)
+
+# Compression of request bodies: none, gzip or zstd (needs the zstandard package)
+COMPRESSION = os.getenv('ATHINA_COMPRESSION') or 'none'
+# bodies smaller than this many bytes are sent uncompressed
+COMPRESSION_THRESHOLD = int(os.getenv('ATHINA_COMPRESSION_THRESHOLD') or 1024)
+
+# JSON serializer for payloads: auto (orjson when installed, else json), orjson or json
+SERIALIZER = os.getenv('ATHINA_SERIALIZER') or 'auto'
+
+# Incremental trace export: completed top-level spans are uploaded in chunks of about this many spans
+TRACE_INCREMENTAL_EXPORT = (os.getenv('ATHINA_TRACE_INCREMENTAL_EXPORT') or 'false').lower() in ('1', 'true', 'yes')
+TRACE_CHUNK_SPANS = int(os.getenv('ATHINA_TRACE_CHUNK_SPANS') or 100)
@@ -0,0 +1,672 @@
+import asyncio
+import atexit
+import functools
+import os
+import queue
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .constants import (
+    EXPORTER_BATCHING_ENABLED,
+    EXPORTER_BLOCK_TIMEOUT,
+    EXPORTER_MAX_BATCH_BYTES,
+    EXPORTER_MAX_BATCH_SIZE,
+    EXPORTER_MAX_LINGER_MS,
+    EXPORTER_MAX_QUEUE_SIZE,
+    EXPORTER_NUM_WORKERS,
+    EXPORTER_OVERFLOW_POLICY,
+    EXPORTER_SAMPLE_HIGH_WATERMARK,
+    EXPORTER_SAMPLE_RATE,
+    EXPORTER_SHUTDOWN_TIMEOUT,
+    SPOOL_DIR,
+    SPOOL_REPLAY_INTERVAL,
+)
+from .request_helper import RequestHelper
+from .serializer import dumps
+from .spool import DiskSpool
+
+
+# queue item that only makes a worker re-check pending batches
+_WAKE_UP = object()
+
+OVERFLOW_POLICIES = ('drop_newest', 'drop_oldest', 'block', 'sample')
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+@dataclass
+class ExportRecord:
+    """
+    a single request to be sent to the athina api by the background exporter.
+    if payload is a callable, it is resolved on the worker thread right before sending.
+    records with a batch_endpoint may be coalesced with others into one array request to that endpoint.
+    """
+    endpoint: str
+    payload: Union[Dict[str, Any], Callable[[], Dict[str, Any]]]
+    headers: Dict[str, str]
+    batch_endpoint: Optional[str] = None
+
+
+class _PendingBatch:
+    """
+    encoded payloads waiting to be sent together as a json array.
+    """
+
+    def __init__(self, endpoint: str, headers: Dict[str, str]):
+        self.endpoint = endpoint
+        self.headers = headers
+        self.parts: List[bytes] = []
+        self.size = 2  # the enclosing brackets
+        self.created_at = time.monotonic()
+
+    def add(self, part: bytes):
+        if self.parts:
+            self.size += 1  # the separating comma
+        self.parts.append(part)
+        self.size += len(part)
+
+    def body(self) -> bytes:
+        return b'[' + b','.join(self.parts) + b']'
+
+
+class _Batcher:
+    """
+    accumulates records per (endpoint, headers) and hands out batches once they reach
+    the max batch size or max byte size, or have been waiting for longer than the max linger time.
+    shared by all worker threads of an exporter.
+    """
+
+    def __init__(self, max_batch_size: int, max_batch_bytes: int, max_linger_ms: int):
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_batch_bytes = max_batch_bytes
+        self._max_linger = max_linger_ms / 1000
+        self._batches: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], _PendingBatch] = {}
+        self._lock = threading.Lock()
+
+    def add(self, endpoint: str, headers: Dict[str, str], part: bytes) -> List[_PendingBatch]:
+        """
+        adds an encoded payload and returns the batches that are ready to be sent.
+        """
+        ready = []
+        key = (endpoint, tuple(sorted(headers.items())))
+        with self._lock:
+            batch = self._batches.get(key)
+            if batch is not None and batch.parts and batch.size + 1 + len(part) > self._max_batch_bytes:
+                ready.append(self._batches.pop(key))
+                batch = None
+            if batch is None:
+                batch = self._batches[key] = _PendingBatch(endpoint, headers)
+            batch.add(part)
+            if len(batch.parts) >= self._max_batch_size or batch.size >= self._max_batch_bytes:
+                ready.append(self._batches.pop(key))
+        return ready
+
+    def pop_due(self, force: bool = False) -> List[_PendingBatch]:
+        """
+        returns the batches that have lingered for long enough, or all of them if force is set.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = [key for key, batch in self._batches.items() if force or now - batch.created_at >= self._max_linger]
+            return [self._batches.pop(key) for key in due]
+
+    def time_until_due(self) -> Optional[float]:
+        """
+        seconds until the oldest pending batch is due, or None if nothing is pending.
+        """
+        with self._lock:
+            if not self._batches:
+                return None
+            oldest = min(batch.created_at for batch in self._batches.values())
+        return max(0.0, oldest + self._max_linger - time.monotonic())
+
+
+class BackgroundExporter:
+    """
+    process-wide exporter that sends records to the athina api.
+
+    records are put on a bounded in-memory queue and drained by a small, fixed
+    pool of daemon worker threads, so submitting a record never creates a thread
+    or an event loop on the caller's thread. when batching is enabled, records
+    that support it are coalesced into a single array request per batch.
+
+    the queue is bounded so logging can never exhaust the memory of the application:
+    at most max_queue_size records are queued and at most num_workers requests are in flight.
+    when the queue is full, the overflow policy decides which record is shed:
+    - drop_newest: the new record is dropped.
+    - drop_oldest: the oldest queued record is dropped to make room for the new one.
+    - block: the caller waits up to block_timeout seconds for room, then the new record is dropped.
+      callers on a running event loop never wait, the new record is dropped right away.
+    - sample: once the queue is filled past sample_high_watermark, only a sample_rate fraction
+      of new records is kept; when it is full, the new record is dropped.
+    dropped records are counted, see stats().
+
+    pending records are drained with a deadline when the process exits, see shutdown().
+
+    the async loggers send from the caller's event loop instead, see schedule(). those sends
+    can only be awaited on their loop, with aflush(), before the loop is closed.
+
+    with a spool, records that fail to send with a transient error (or are still pending
+    at shutdown) are written to disk instead of being lost, and replayed in their original
+    batches once requests to the api succeed again.
+    """
+    _instance: Optional['BackgroundExporter'] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        max_queue_size: int = EXPORTER_MAX_QUEUE_SIZE,
+        num_workers: int = EXPORTER_NUM_WORKERS,
+        batching: bool = EXPORTER_BATCHING_ENABLED,
+        max_batch_size: int = EXPORTER_MAX_BATCH_SIZE,
+        max_batch_bytes: int = EXPORTER_MAX_BATCH_BYTES,
+        max_linger_ms: int = EXPORTER_MAX_LINGER_MS,
+        overflow_policy: str = EXPORTER_OVERFLOW_POLICY,
+        block_timeout: float = EXPORTER_BLOCK_TIMEOUT,
+        sample_rate: float = EXPORTER_SAMPLE_RATE,
+        sample_high_watermark: float = EXPORTER_SAMPLE_HIGH_WATERMARK,
+        spool: Optional[DiskSpool] = None,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f'overflow_policy must be one of {", ".join(OVERFLOW_POLICIES)}, got {overflow_policy}')
+        self._max_queue_size = max_queue_size
+        self._num_workers = max(1, num_workers)
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._batcher = _Batcher(max_batch_size, max_batch_bytes, max_linger_ms) if batching else None
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._overflow_policy = overflow_policy
+        self._block_timeout = block_timeout
+        self._sample_rate = sample_rate
+        self._sample_threshold = int(max_queue_size * sample_high_watermark)
+        self._counters = {
+            'accepted': 0,
+            'sent': 0,
+            'failed': 0,
+            'dropped_overflow': 0,
+            'dropped_sampled': 0,
+            'dropped_shutdown': 0,
+            'spooled': 0,
+            'replayed': 0,
+        }
+        if spool is None and SPOOL_DIR is not None:
+            spool = DiskSpool(SPOOL_DIR)
+        self._spool = spool
+        self._replay_lock = threading.Lock()
+        self._last_replay = time.monotonic()
+        # records accepted but not yet sent (queued, in flight or waiting in a batch)
+        self._unfinished = 0
+        self._all_done = threading.Condition(threading.Lock())
+        self._flushing = 0
+        self._closed = False
+        # sends scheduled on event loops by the async loggers, per loop in the order they were scheduled
+        self._loop_tasks: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[asyncio.Task, None]]' = \
+            weakref.WeakKeyDictionary()
+
+    @classmethod
+    def get_instance(cls) -> 'BackgroundExporter':
+        """
+        returns the process-wide exporter, creating it on first use.
+        """
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def configure(cls, **kwargs: Any) -> 'BackgroundExporter':
+        """
+        replaces the process-wide exporter with one created with the given settings,
+        see BackgroundExporter.__init__. records already queued on the previous exporter are still sent.
+        """
+        with cls._instance_lock:
+            previous = cls._instance
+            cls._instance = cls(**kwargs)
+        if previous is not None:
+            previous._stop_workers()
+        return cls._instance
+
+    @property
+    def dropped(self) -> int:
+        """
+        number of records dropped by the overflow policy or because the exporter was shut down.
+        """
+        counters = self._counters
+        return counters['dropped_overflow'] + counters['dropped_sampled'] + counters['dropped_shutdown']
+
+    @property
+    def pending(self) -> int:
+        """
+        number of records accepted but not sent yet.
+        """
+        return self._unfinished
+
+    @property
+    def async_pending(self) -> int:
+        """
+        number of sends scheduled on event loops that are not done yet.
+        """
+        return sum(len(tasks) for tasks in list(self._loop_tasks.values()))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        returns the exporter counters: records accepted, sent, failed to send and dropped
+        (by the overflow policy, by sampling or at shutdown), plus the records currently queued and pending
+        and the sends pending on event loops.
+        with a spool, also the records spooled to disk, the spooled requests replayed and the spool segments evicted.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        if self._spool is not None:
+            stats['spool_evicted'] = self._spool.evicted_segments
+        stats['queued'] = self._queue.qsize()
+        stats['pending'] = self._unfinished
+        stats['async_pending'] = self.async_pending
+        return stats
+
+    def submit(self, record: ExportRecord) -> bool:
+        """
+        enqueues a record for sending and returns False if it was dropped.
+        only blocks with the block overflow policy, for at most block_timeout seconds. called from a
+        running event loop, e.g. by the async openai middleware, it never blocks: the new record is
+        dropped like with drop_newest.
+        """
+        if self._closed:
+            self._count('dropped_shutdown')
+            return False
+        self._ensure_workers()
+        policy = self._overflow_policy
+        if policy == 'sample' and self._queue.qsize() >= self._sample_threshold and random.random() >= self._sample_rate:
+            self._count('dropped_sampled')
+            return False
+        with self._all_done:
+            self._unfinished += 1
+        try:
+            if policy == 'block' and not _in_event_loop():
+                self._queue.put(record, timeout=self._block_timeout)
+            elif policy == 'drop_oldest':
+                self._put_dropping_oldest(record)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self._task_done(1)
+            self._count('dropped_overflow')
+            return False
+        self._count('accepted')
+        return True
+
+    def _put_dropping_oldest(self, record: ExportRecord):
+        while True:
+            try:
+                self._queue.put_nowait(record)
+                return
+            except queue.Full:
+                pass
+            try:
+                oldest = self._queue.get_nowait()
+            except queue.Empty:
+                continue
+            if oldest is None:
+                # never drop a stop sentinel, the exporter is being replaced
+                self._queue.put_nowait(oldest)
+                raise queue.Full
+            if oldest is not _WAKE_UP:
+                self._task_done(1)
+                self._count('dropped_overflow')
+
+    def schedule(self, coroutine) -> Optional[asyncio.Task]:
+        """
+        runs a send coroutine as a task on the running event loop, for the async loggers.
+        the send shares the counters of the exporter and is awaited by aflush().
+
+        like the queue, at most max_queue_size sends are pending per loop, and the overflow policy
+        decides which one is shed when there are more. block never blocks the loop: the new send
+        is dropped like with drop_newest. returns None if the send was dropped.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = self._loop_tasks.get(loop)
+            if tasks is None:
+                tasks = self._loop_tasks[loop] = {}
+        if self._closed:
+            return self._drop_send(coroutine, 'dropped_shutdown')
+        policy = self._overflow_policy
+        if policy == 'sample' and len(tasks) >= self._sample_threshold and random.random() >= self._sample_rate:
+            return self._drop_send(coroutine, 'dropped_sampled')
+        if len(tasks) >= self._max_queue_size:
+            if policy != 'drop_oldest':
+                return self._drop_send(coroutine, 'dropped_overflow')
+            oldest = next(iter(tasks))
+            # removed first, so its done callback does not count it as dropped at shutdown
+            del tasks[oldest]
+            oldest.cancel()
+            self._count('dropped_overflow')
+        task = loop.create_task(self._send_async(coroutine))
+        tasks[task] = None
+        task.add_done_callback(functools.partial(self._async_send_done, tasks, coroutine))
+        self._count('accepted')
+        return task
+
+    def _drop_send(self, coroutine, counter: str) -> None:
+        coroutine.close()
+        self._count(counter)
+        return None
+
+    async def _send_async(self, coroutine):
+        try:
+            await coroutine
+            self._count('sent')
+        except Exception as e:
+            self._count('failed')
+            print("Error in logging to Athina: ", str(e))
+
+    def _async_send_done(self, tasks: Dict[asyncio.Task, None], coroutine, task: asyncio.Task):
+        # a task cancelled before it started never ran the coroutine
+        coroutine.close()
+        if task not in tasks:
+            return
+        del tasks[task]
+        if task.cancelled():
+            # asyncio.run() cancels the tasks still pending when the loop is closed
+            self._count('dropped_shutdown')
+            print("Athina log dropped because its event loop was closed before it was sent, "
+                  "await athina_logger.aflush() before the loop is closed")
+
+    async def aflush(self, timeout: Optional[float] = None) -> bool:
+        """
+        waits until the sends scheduled on the running event loop and every record accepted by the
+        background workers have been sent, or until the timeout (in seconds) expires.
+        returns True if everything was sent.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        tasks = list(self._loop_tasks.get(loop, ()))
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            if pending:
+                return False
+        if self._unfinished == 0:
+            return True
+        remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        return await loop.run_in_executor(None, self._wait_sent, remaining)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        blocks until every record accepted so far has been sent, including partially filled
+        batches, or until the timeout (in seconds) expires. returns True if everything was sent.
+        sends scheduled on event loops by the async loggers are not waited for, see aflush().
+        """
+        async_pending = self.async_pending
+        if async_pending:
+            print(f"Athina flush does not wait for {async_pending} logs pending on event loops, "
+                  f"await athina_logger.aflush() on their loop")
+        return self._wait_sent(timeout)
+
+    def _wait_sent(self, timeout: Optional[float]) -> bool:
+        if self._pid != os.getpid():
+            return True
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._all_done:
+            self._flushing += 1
+        try:
+            self._wake_workers()
+            with self._all_done:
+                while self._unfinished > 0:
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._all_done.wait(remaining)
+                return True
+        finally:
+            with self._all_done:
+                self._flushing -= 1
+
+    def shutdown(self, timeout: Optional[float] = None) -> int:
+        """
+        stops accepting records, sends the pending ones until the timeout (in seconds) expires
+        and stops the workers. returns the number of records that could not be sent in time.
+        """
+        self._closed = True
+        self.flush(timeout)
+        if self._spool is not None:
+            self._spool_unsent()
+        undelivered = self._unfinished
+        self._stop_workers()
+        if undelivered:
+            self._count('dropped_shutdown', undelivered)
+            print(f"Athina exporter shut down with {undelivered} unsent records dropped")
+        return undelivered
+
+    def _count(self, counter: str, count: int = 1):
+        with self._lock:
+            self._counters[counter] += count
+
+    def _task_done(self, count: int):
+        with self._all_done:
+            self._unfinished -= count
+            if self._unfinished <= 0:
+                self._all_done.notify_all()
+
+    def _ensure_workers(self):
+        # workers do not survive a fork, so they are (re)started lazily per process
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            if self._pid is not None:
+                self._queue = queue.Queue(maxsize=self._max_queue_size)
+                self._unfinished = 0
+            self._workers = []
+            for i in range(self._num_workers):
+                worker = threading.Thread(target=self._run, name=f'athina-exporter-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            self._pid = pid
+
+    def _wake_workers(self):
+        # workers waiting for a batch to linger re-check their timeout on any queue item
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(_WAKE_UP)
+            except queue.Full:
+                return
+
+    def _stop_workers(self):
+        if self._pid != os.getpid():
+            return
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                # the workers are daemon threads, they do not keep the process alive
+                return
+
+    def _next_timeout(self) -> Optional[float]:
+        due = self._batcher.time_until_due() if self._batcher is not None else None
+        if due is not None and self._flushing:
+            return 0
+        if self._spool is not None and len(self._spool):
+            # wake up periodically to replay records spooled by this or a previous process
+            due = min(due, SPOOL_REPLAY_INTERVAL) if due is not None else SPOOL_REPLAY_INTERVAL
+        return due
+
+    def _run(self):
+        while True:
+            try:
+                record = self._queue.get(timeout=self._next_timeout())
+            except queue.Empty:
+                record = _WAKE_UP
+            if record is None:
+                if self._batcher is not None:
+                    self._send_batches(self._batcher.pop_due(force=True))
+                return
+            if record is not _WAKE_UP:
+                self._process(record)
+            if self._batcher is not None:
+                self._send_batches(self._batcher.pop_due(force=self._flushing > 0))
+            if self._spool is not None:
+                self._maybe_replay_spool()
+
+    def _process(self, record: ExportRecord):
+        try:
+            payload = record.payload() if callable(record.payload) else record.payload
+            # the payload is encoded once, the same bytes are batched, sent or spooled
+            body = dumps(payload)
+            if self._batcher is not None and record.batch_endpoint is not None:
+                self._send_batches(self._batcher.add(record.batch_endpoint, record.headers, body))
+                return
+            RequestHelper.make_post_request(endpoint=record.endpoint, payload=None, headers=record.headers, data=body)
+            self._count('sent')
+        except Exception as e:
+            if not self._spool_failed(e, record.endpoint, record.headers, lambda: body, 1):
+                self._count('failed')
+                print("Error in logging to Athina: ", str(e))
+        self._task_done(1)
+
+    def _send_batches(self, batches: List[_PendingBatch]):
+        for batch in batches:
+            try:
+                RequestHelper.make_post_request(
+                    endpoint=batch.endpoint, payload=None, headers=batch.headers, data=batch.body())
+                self._count('sent', len(batch.parts))
+            except Exception as e:
+                if not self._spool_failed(e, batch.endpoint, batch.headers, batch.body, len(batch.parts)):
+                    self._count('failed', len(batch.parts))
+                    print(f"Error in logging batch of {len(batch.parts)} records to Athina: ", str(e))
+            self._task_done(len(batch.parts))
+
+    def _spool_failed(self, error: Exception, endpoint: str, headers: Dict[str, str],
+                      body: Callable[[], bytes], count: int) -> bool:
+        # permanent errors (e.g. an invalid payload) would fail again on replay, so they are not spooled
+        if self._spool is None or not RequestHelper.is_transient_error(error):
+            return False
+        try:
+            self._spool.append(endpoint, headers, body())
+        except Exception as e:
+            print("Error in spooling logs to disk: ", str(e))
+            return False
+        self._count('spooled', count)
+        return True
+
+    def _spool_unsent(self):
+        # records that could not be sent before the shutdown deadline are spooled instead of dropped
+        records = []
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not None and record is not _WAKE_UP:
+                records.append(record)
+        for record in records:
+            try:
+                payload = record.payload() if callable(record.payload) else record.payload
+                self._spool.append(record.endpoint, record.headers, dumps(payload))
+                self._count('spooled')
+            except Exception as e:
+                print("Error in spooling logs to disk: ", str(e))
+            self._task_done(1)
+        if self._batcher is not None:
+            for batch in self._batcher.pop_due(force=True):
+                try:
+                    self._spool.append(batch.endpoint, batch.headers, batch.body())
+                    self._count('spooled', len(batch.parts))
+                except Exception as e:
+                    print("Error in spooling logs to disk: ", str(e))
+                self._task_done(len(batch.parts))
+        self._spool.close()
+
+    def _maybe_replay_spool(self):
+        if not len(self._spool) or time.monotonic() - self._last_replay < SPOOL_REPLAY_INTERVAL:
+            return
+        # one worker replays at a time, the others keep draining the queue
+        if not self._replay_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_replay = time.monotonic()
+            self._replay()
+        finally:
+            self._replay_lock.release()
+
+    def replay_spool(self) -> int:
+        """
+        sends the spooled records, oldest first, until the spool is empty or a send fails
+        with a transient error. returns the number of spooled requests that were sent.
+        """
+        if self._spool is None:
+            return 0
+        with self._replay_lock:
+            return self._replay()
+
+    def _replay(self) -> int:
+        replayed = 0
+        try:
+            while True:
+                taken = self._spool.take_oldest()
+                if taken is None:
+                    return replayed
+                path, entries = taken
+                for i, entry in enumerate(entries):
+                    try:
+                        RequestHelper.make_post_request(
+                            endpoint=entry['endpoint'], payload=None, headers=entry['headers'],
+                            data=entry['body'].encode('utf-8'))
+                        replayed += 1
+                        self._count('replayed')
+                    except Exception as e:
+                        if RequestHelper.is_transient_error(e):
+                            self._spool.complete(path, entries[i:])
+                            return replayed
+                        self._count('failed')
+                        print("Error in replaying spooled logs to Athina: ", str(e))
+                self._spool.complete(path, [])
+        except Exception as e:
+            # e.g. the spool directory became unreadable, the worker keeps sending the queued records
+            print("Error in replaying spooled logs to Athina: ", str(e))
+            return replayed
+
+
+def flush(timeout: Optional[float] = None) -> bool:
+    """
+    blocks until all logs recorded so far have been sent to athina, or until the timeout
+    (in seconds) expires. returns True if everything was sent.
+    """
+    return BackgroundExporter.get_instance().flush(timeout)
+
+
+async def aflush(timeout: Optional[float] = None) -> bool:
+    """
+    waits until all logs recorded so far, including the ones sent from the running event loop by
+    the async loggers, have been sent to athina, or until the timeout (in seconds) expires.
+    returns True if everything was sent.
+    """
+    return await BackgroundExporter.get_instance().aflush(timeout)
+
+
+def shutdown(timeout: Optional[float] = EXPORTER_SHUTDOWN_TIMEOUT) -> int:
+    """
+    sends the pending logs until the timeout (in seconds) expires and stops the background
+    exporter. returns the number of records that were dropped because they could not be sent in time.
+    """
+    return BackgroundExporter.get_instance().shutdown(timeout)
+
+
+@atexit.register
+def _shutdown_at_exit():
+    exporter = BackgroundExporter._instance
+    if exporter is not None and exporter._pid == os.getpid() and not exporter._closed:
+        exporter.shutdown(EXPORTER_SHUTDOWN_TIMEOUT)
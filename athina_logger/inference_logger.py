@@ -1,10 +1,10 @@
-import asyncio
-import threading
-from typing import List, Optional, Dict, Union, Any
+import functools
+from typing import Callable, List, Optional, Dict, Union, Any
 
 from .api_key import AthinaApiKey
 from .constants import API_BASE_URL
-from .request_helper import RequestHelper
+from .exporter import BackgroundExporter, ExportRecord
+from .util.stream_metrics import tokens_per_second as stream_tokens_per_second
 
 
 class InferenceLogger(AthinaApiKey):
@@ -35,6 +35,11 @@ class InferenceLogger(AthinaApiKey):
             custom_eval_metrics: Optional[Dict] = None,
             cost: Optional[float] = None,
             model_options: Optional[dict] = None,
+            time_to_first_token: Optional[float] = None,
+            stream_duration: Optional[float] = None,
+            tokens_per_second: Optional[float] = None,
+            inter_chunk_latency: Optional[Dict[str, float]] = None,
+            token_usage: Optional[Callable[[], Dict[str, Optional[int]]]] = None,
     ) -> None:
         """
             logs prompt run data to athina.
@@ -72,6 +77,14 @@ class InferenceLogger(AthinaApiKey):
               - `stop` (Union[str, List[str]], optional): Stop sequence(s) to halt generation.
               - `top_p` (float, optional): Top-p sampling parameter.
               - `extra_options` (Dict[str, Any], optional): Any additional options for model customization.
+            - time_to_first_token (float, optional): For streamed completions, milliseconds from sending the request to the first chunk.
+            - stream_duration (float, optional): For streamed completions, milliseconds from sending the request to the last chunk.
+            - tokens_per_second (float, optional): For streamed completions, completion tokens generated per second after the first one.
+              Derived from completion_tokens, time_to_first_token and stream_duration when not given.
+            - inter_chunk_latency (Dict[str, float], optional): For streamed completions, p50, p90, p99 and max milliseconds between chunks.
+            - token_usage (Callable[[], Dict[str, Optional[int]]], optional): Counts the prompt_tokens, completion_tokens
+              and total_tokens. Called on the background exporter right before the payload is sent, so tokenizing
+              never blocks the caller. Token counts passed explicitly take precedence.
 
             Returns:
             - None: The method does not return any value.
@@ -80,56 +93,89 @@ class InferenceLogger(AthinaApiKey):
             - None: errors are suppressed and printed.
             """
         try:
-            args = (
+            payload = InferenceLogger._build_inference_payload(
                 prompt, response, prompt_slug, language_model_id, environment, functions, function_call_response, tools,
                 tool_calls, external_reference_id, customer_id, customer_user_id, session_id, user_query, prompt_tokens,
                 completion_tokens, total_tokens, response_time, context, expected_response, custom_attributes, cost,
-                custom_eval_metrics, model_options)
-            threading.Thread(target=lambda: asyncio.run(InferenceLogger._log_inference_asynchronously(*args))).start()
+                custom_eval_metrics, model_options, time_to_first_token, stream_duration, tokens_per_second,
+                inter_chunk_latency)
+            if token_usage is not None:
+                # tokens are counted on the exporter worker, right before the payload is encoded
+                payload = functools.partial(InferenceLogger._add_token_usage, payload, token_usage)
+            BackgroundExporter.get_instance().submit(ExportRecord(
+                endpoint=f'{API_BASE_URL}/api/v1/log/inference',
+                payload=payload,
+                headers={
+                    'athina-api-key': InferenceLogger.get_api_key(),
+                },
+                batch_endpoint=f'{API_BASE_URL}/api/v1/log/inference/batch',
+            ))
         except Exception as e:
             print("Error in logging inference to Athina: ", str(e))
 
     @staticmethod
-    async def _log_inference_asynchronously(
+    def _add_token_usage(payload: Dict[str, Any], token_usage: Callable[[], Dict[str, Optional[int]]]) -> Dict[str, Any]:
+        """
+        adds the lazily counted token usage to the payload, without overriding the counts it already has
+        """
+        try:
+            usage = token_usage()
+        except Exception as e:
+            print("Error in counting tokens for Athina: ", str(e))
+            return payload
+        for key, value in usage.items():
+            if value is not None and key not in payload:
+                payload[key] = value
+        if 'tokens_per_second' not in payload:
+            throughput = stream_tokens_per_second(
+                payload.get('completion_tokens'), payload.get('time_to_first_token'), payload.get('stream_duration'))
+            if throughput is not None:
+                payload['tokens_per_second'] = throughput
+        return payload
+
+    @staticmethod
+    def _build_inference_payload(
             prompt, response, prompt_slug, language_model_id, environment, functions, function_call_response, tools,
             tool_calls, external_reference_id, customer_id, customer_user_id, session_id, user_query, prompt_tokens,
             completion_tokens, total_tokens, response_time, context, expected_response, custom_attributes, cost,
-            custom_eval_metrics, model_options
-    ) -> None:
+            custom_eval_metrics, model_options, time_to_first_token, stream_duration, tokens_per_second,
+            inter_chunk_latency
+    ) -> Dict[str, Any]:
         """
-        logs the llm inference to athina
+        builds the payload for the log inference endpoint
         """
-        try:
-            payload = {
-                'prompt': prompt,
-                'response': response,
-                'prompt_slug': prompt_slug,
-                'language_model_id': language_model_id,
-                'functions': functions,
-                'function_call_response': function_call_response,
-                'tools': tools,
-                'tool_calls': tool_calls,
-                'response_time': response_time,
-                'context': context,
-                'environment': environment,
-                'customer_id': str(customer_id) if customer_id is not None else None,
-                'customer_user_id': str(customer_user_id) if customer_user_id is not None else None,
-                'session_id': str(session_id) if session_id is not None else None,
-                'user_query': str(user_query) if user_query is not None else None,
-                'external_reference_id': str(external_reference_id) if external_reference_id is not None else None,
-                'prompt_tokens': prompt_tokens,
-                'completion_tokens': completion_tokens,
-                'total_tokens': total_tokens,
-                'expected_response': expected_response,
-                'custom_attributes': custom_attributes,
-                'custom_eval_metrics': custom_eval_metrics,
-                'cost': cost,
-                'model_options': model_options,
-            }
-            # Remove None fields from the payload
-            payload = {k: v for k, v in payload.items() if v is not None}
-            RequestHelper.make_post_request(endpoint=f'{API_BASE_URL}/api/v1/log/inference', payload=payload, headers={
-                'athina-api-key': InferenceLogger.get_api_key(),
-            })
-        except Exception as e:
-            print("Error in logging inference to Athina: ", str(e))
+        if tokens_per_second is None:
+            tokens_per_second = stream_tokens_per_second(completion_tokens, time_to_first_token, stream_duration)
+        payload = {
+            # the payload is encoded later on the exporter, callers commonly append the reply to their messages list
+            'prompt': list(prompt) if isinstance(prompt, list) else prompt,
+            'response': response,
+            'prompt_slug': prompt_slug,
+            'language_model_id': language_model_id,
+            'functions': functions,
+            'function_call_response': function_call_response,
+            'tools': tools,
+            'tool_calls': tool_calls,
+            'response_time': response_time,
+            'context': context,
+            'environment': environment,
+            'customer_id': str(customer_id) if customer_id is not None else None,
+            'customer_user_id': str(customer_user_id) if customer_user_id is not None else None,
+            'session_id': str(session_id) if session_id is not None else None,
+            'user_query': str(user_query) if user_query is not None else None,
+            'external_reference_id': str(external_reference_id) if external_reference_id is not None else None,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': total_tokens,
+            'expected_response': expected_response,
+            'custom_attributes': custom_attributes,
+            'custom_eval_metrics': custom_eval_metrics,
+            'cost': cost,
+            'model_options': model_options,
+            'time_to_first_token': time_to_first_token,
+            'stream_duration': stream_duration,
+            'tokens_per_second': tokens_per_second,
+            'inter_chunk_latency': inter_chunk_latency,
+        }
+        # Remove None fields from the payload
+        return {k: v for k, v in payload.items() if v is not None}
@@ -1,4 +1,4 @@
-from datetime import datetime, timezone
+import time
 from typing import Any, Dict, List, Optional, Tuple, Union, Sequence
 from uuid import UUID
 from .util.extract_model import _extract_model_name
@@ -107,7 +107,7 @@ class CallbackHandler(BaseCallbackHandler, AthinaApiKey):
                 'customer_user_id': self.customer_user_id,
                 'external_reference_id': self.external_reference_id,
                 'custom_attributes': self.custom_attributes,
-                'llm_start_time': datetime.now(timezone.utc),
+                'llm_start_time': time.perf_counter(),
                 'language_model_id': language_model_id
             }
         except Exception as e:
@@ -155,7 +155,7 @@ class CallbackHandler(BaseCallbackHandler, AthinaApiKey):
                 'customer_user_id': self.customer_user_id,
                 'external_reference_id': self.external_reference_id,
                 'custom_attributes': self.custom_attributes,
-                'llm_start_time': datetime.now(timezone.utc),
+                'llm_start_time': time.perf_counter(),
                 'language_model_id': language_model_id
             }
         except Exception as e:
@@ -180,9 +180,7 @@ class CallbackHandler(BaseCallbackHandler, AthinaApiKey):
             run_info = self.runs.get(run_id, {})
             if not run_info:
                 return
-            llm_end_time = datetime.now(timezone.utc)
-            run_info['response_time'] = round((
-                (llm_end_time - run_info['llm_start_time']).total_seconds())*1000)
+            run_info['response_time'] = round((time.perf_counter() - run_info['llm_start_time']) * 1000)
 
             for i in range(len(response.generations)):
                 generation = response.generations[i][0]
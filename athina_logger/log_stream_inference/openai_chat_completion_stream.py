@@ -1,10 +1,10 @@
+import functools
 from typing import List, Optional, Dict, Any
-import tiktoken
-from ..constants import LOG_INFERENCE_URL
 from .log_stream_inference import LogStreamInference
 from ..api_key import AthinaApiKey
-from ..request_helper import RequestHelper
-from ..util.token_count_helper import get_prompt_tokens_openai_chat_completion, get_completion_tokens_openai_chat_completion
+from ..inference_logger import InferenceLogger
+from ..util.stream_assembler import StreamAssembler
+from ..util.token_count_helper import count_chat_completion_token_usage
 
 
 class LogOpenAiChatCompletionStreamInference(LogStreamInference, AthinaApiKey):
@@ -21,7 +21,8 @@ class LogOpenAiChatCompletionStreamInference(LogStreamInference, AthinaApiKey):
                  user_query: Optional[str] = None,
                  external_reference_id: Optional[str] = None,
                  custom_attributes: Optional[Dict] = None,
-                 custom_eval_metrics: Optional[Dict] = None):
+                 custom_eval_metrics: Optional[Dict] = None,
+                 request_started_at: Optional[float] = None):
         """
         constructor for log stream inference
         :param prompt_slug: str - The slug of the prompt used for the inference.
@@ -37,6 +38,7 @@ class LogOpenAiChatCompletionStreamInference(LogStreamInference, AthinaApiKey):
         :param external_reference_id: Optional[str] - The external reference id. Defaults to None.
         :param custom_attributes: Optional[Dict] - A dictionary containing custom attributes. Defaults to None.
         :param custom_eval_metrics: Optional[Dict] - A dictionary containing custom evaluation metrics. Defaults to None.
+        :param request_started_at: Optional[float] - The time.perf_counter() value when the request was sent. The stream latency metrics are measured from it. Defaults to None, in which case they are measured from the creation of the logger and time_to_first_token is a lower bound.
         """
         super().__init__(
             prompt_slug=prompt_slug,
@@ -52,23 +54,41 @@ class LogOpenAiChatCompletionStreamInference(LogStreamInference, AthinaApiKey):
             custom_eval_metrics=custom_eval_metrics)
         self.prompt = prompt
         self.language_model_id = language_model_id
-        self.response = ''
+        self._stream = StreamAssembler(request_started_at)
 
-    def _get_text_from_stream_chunk(self, stream_chunk):
+    @property
+    def response(self) -> str:
         """
-        gets the text from the stream chunk
+        the text of the first choice of the stream
         """
-        try:
-            text = ''
-            choices = stream_chunk.get('choices', []) 
-            if choices and len(choices) > 0 and 'delta' in choices[0]:
-                delta = choices[0].get('delta', {})
-                if 'content' in delta and delta['content'] is not None:
-                    text = delta.get('content', '')
+        return self._stream.text
 
-            return text
-        except Exception as e:
-            raise e
+    @response.setter
+    def response(self, response: str):
+        self._stream.text = response
+
+    @property
+    def usage(self) -> Optional[Dict[str, Any]]:
+        """
+        the token usage reported by openai in the last chunk, with stream_options={'include_usage': True}
+        """
+        return self._stream.usage
+
+    @property
+    def stream_metrics(self) -> Dict[str, Any]:
+        """
+        the latency metrics of the stream in milliseconds: time_to_first_token, stream_duration and
+        inter_chunk_latency percentiles. they are measured from request_started_at, or from the creation
+        of the logger, which leaves out the wait for the server when the request was sent before it
+        """
+        return self._stream.metrics()
+
+    @property
+    def completion(self) -> Dict[str, Any]:
+        """
+        the completion assembled from the stream, with all choices, tool calls and finish reasons
+        """
+        return self._stream.completion()
 
     def collect_stream_inference(self, response):
         """
@@ -76,12 +96,7 @@ class LogOpenAiChatCompletionStreamInference(LogStreamInference, AthinaApiKey):
         """
         try:
             for stream_chunk in response:
-                if isinstance(stream_chunk, dict):
-                    self.response += self._get_text_from_stream_chunk(
-                        stream_chunk)
-                else:
-                    self.response += self._get_text_from_stream_chunk(
-                        stream_chunk.model_dump())
+                self.collect_stream_inference_by_chunk(stream_chunk)
         except Exception as e:
             raise e
 
@@ -90,35 +105,27 @@ class LogOpenAiChatCompletionStreamInference(LogStreamInference, AthinaApiKey):
         collects the inference from the log stream of openai chat completion chunk by chunk
         """
         try:
-            if isinstance(stream_chunk, dict):
-                self.response += self._get_text_from_stream_chunk(
-                    stream_chunk)
-            else:
-                self.response += self._get_text_from_stream_chunk(
-                    stream_chunk.model_dump())
+            self._stream.add(stream_chunk)
         except Exception as e:
             raise e
 
     def log_stream_inference(self):
         """
-        logs the stream inference to the athina api server
+        logs the stream inference to the athina api server.
+        the record is sent by the background exporter, which also counts the tokens
+        when openai did not report the usage
         """
         try:
-            prompt_tokens = self._get_prompt_tokens(
-                prompt=self.prompt, language_model_id=self.language_model_id)
-
-            completion_tokens = self._get_completion_tokens(
-                response=self.response, language_model_id=self.language_model_id)
-
-            if prompt_tokens is not None and completion_tokens is not None:
-                total_tokens = prompt_tokens + completion_tokens
-            else:
-                total_tokens = None
+            usage = self.usage or {}
+            # sent and counted later, a copy so messages appended after this call are not part of it
+            prompt = list(self.prompt) if isinstance(self.prompt, list) else self.prompt
             payload = {
                 'prompt_slug': self.prompt_slug,
-                'prompt': self.prompt,
+                'prompt': prompt,
                 'language_model_id': self.language_model_id,
-                'response': self.response,
+                # the completion assembled from the stream with all choices, finish reasons, logprobs and the
+                # system fingerprint, like the response logged by the openai wrapper
+                'response': self.completion,
                 'response_time': self.response_time,
                 'context': self.context,
                 'environment': self.environment,
@@ -127,38 +134,25 @@ class LogOpenAiChatCompletionStreamInference(LogStreamInference, AthinaApiKey):
                 'session_id': str(self.session_id) if self.session_id is not None else None,
                 'user_query': str(self.user_query) if self.user_query is not None else None,
                 'external_reference_id': str(self.external_reference_id) if self.external_reference_id is not None else None,
-                'prompt_tokens': prompt_tokens,
-                'completion_tokens': completion_tokens,
-                'total_tokens': total_tokens,
+                'prompt_tokens': usage.get('prompt_tokens'),
+                'completion_tokens': usage.get('completion_tokens'),
+                'total_tokens': usage.get('total_tokens'),
                 'custom_attributes': self.custom_attributes,
                 'custom_eval_metrics': self.custom_eval_metrics,
+                # time_to_first_token, stream_duration and inter_chunk_latency
+                **self.stream_metrics,
             }
             # Remove None fields from the payload
             payload = {k: v for k, v in payload.items() if v is not None}
-            RequestHelper.make_post_request(endpoint=LOG_INFERENCE_URL, payload=payload, headers={
-                'athina-api-key': LogOpenAiChatCompletionStreamInference.get_api_key(),
-            })
+            message = self._stream.message()
+            if message is not None:
+                if 'tool_calls' in message:
+                    payload['tool_calls'] = message['tool_calls']
+                if 'function_call' in message:
+                    payload['function_call_response'] = message['function_call']
+            if self.usage is None:
+                payload['token_usage'] = functools.partial(
+                    count_chat_completion_token_usage, prompt, self.response, self.language_model_id)
+            InferenceLogger.log_inference(**payload)
         except Exception as e:
             raise e
-
-    def _get_prompt_tokens(self, prompt: List[Dict[str, Any]], language_model_id: str):
-        """
-        gets the prompt tokens given the prompt for the openai chat model completion
-        """
-        try:
-            tokens = get_prompt_tokens_openai_chat_completion(
-                prompt=prompt, language_model_id=language_model_id)
-            return tokens
-        except Exception as e:
-            return None
-
-    def _get_completion_tokens(self, response: str, language_model_id: str):
-        """
-        gets the completion tokens given the prompt response from the openai chat model completion
-        """
-        try:
-            tokens = get_completion_tokens_openai_chat_completion(
-                response=response, language_model_id=language_model_id)
-            return tokens
-        except Exception as e:
-            return None
@@ -1,16 +1,14 @@
 import importlib
-from dataclasses import dataclass
-import datetime
+from dataclasses import replace
 import functools
 import traceback
-import threading
-from typing import Any, Callable, Dict, Optional, List
+from typing import Optional
 import time
 from .athina_meta import AthinaMeta
 from .inference_logger import InferenceLogger
-from .api_key import AthinaApiKey
 import openai
-from .util.token_count_helper import get_prompt_tokens_openai_chat_completion, get_completion_tokens_openai_chat_completion
+from .util.stream_assembler import StreamAssembler
+from .util.token_count_helper import count_chat_completion_token_usage
 
 # Check OpenAI version
 openai_version = openai.__version__
@@ -65,27 +63,121 @@ def log_to_athina(result: dict, args: dict, athina_meta: AthinaMeta):
         traceback.print_exc()
 
 
-class OpenAiMiddleware:
-    _athina_meta: Optional[AthinaMeta]
-    _args: Optional[any]
-    _kwargs: Optional[dict]
-    athina_response = ''
+def log_stream_to_athina(stream: StreamAssembler, args: dict, athina_meta: AthinaMeta):
+    """
+    logs the completion assembled from a stream to athina
+    """
+    try:
+        usage = stream.usage or {}
+        # sent and counted later, a copy so messages appended after the stream ended are not part of it
+        messages = list(args["messages"])
+        payload = {
+            'prompt_slug': athina_meta.prompt_slug,
+            'prompt': messages,
+            'language_model_id': args["model"],
+            # the completion assembled from the stream, like the response logged without streaming
+            'response': stream.completion(),
+            'response_time': athina_meta.response_time,
+            'context': athina_meta.context,
+            'environment': athina_meta.environment,
+            'customer_id': str(athina_meta.customer_id) if athina_meta.customer_id is not None else None,
+            'customer_user_id': str(athina_meta.customer_user_id) if athina_meta.customer_user_id is not None else None,
+            'session_id': str(athina_meta.session_id) if athina_meta.session_id is not None else None,
+            'user_query': str(athina_meta.user_query) if athina_meta.user_query is not None else None,
+            'external_reference_id': str(athina_meta.external_reference_id) if athina_meta.external_reference_id is not None else None,
+            'prompt_tokens': usage.get('prompt_tokens'),
+            'completion_tokens': usage.get('completion_tokens'),
+            'total_tokens': usage.get('total_tokens'),
+            'custom_attributes': athina_meta.custom_attributes,
+            'custom_eval_metrics': athina_meta.custom_eval_metrics,
+            # time_to_first_token, stream_duration and inter_chunk_latency
+            **stream.metrics(),
+        }
+        # Remove None fields from the payload
+        payload = {k: v for k, v in payload.items() if v is not None}
+        if stream.usage is None:
+            # counted on the background exporter, so the end of the stream never waits on the tokenizer
+            payload['token_usage'] = functools.partial(
+                count_chat_completion_token_usage, messages, stream.text, args["model"])
+        InferenceLogger.log_inference(**payload)
+    except Exception as e:
+        print("Exception while logging to Athina: ", e)
+        traceback.print_exc()
 
-    def __init__(self):
-        pass
+
+def with_response_time(athina_meta: Optional[AthinaMeta], response_time_ms: int) -> AthinaMeta:
+    """
+    the athina meta of a call with its response time, or a default one.
+    the caller's meta is copied, not changed: it is often shared by concurrent calls
+    """
+    if athina_meta is not None:
+        return replace(athina_meta, response_time=response_time_ms)
+    return AthinaMeta(
+        prompt_slug="default",
+        response_time=response_time_ms,
+        environment="default",
+    )
+
+
+class OpenAiCall:
+    """
+    state of one intercepted chat completion call: its arguments, athina meta and stream.
+    every call gets its own, so concurrent calls never share mutable state and the
+    middlewares need no locks.
+    """
+    __slots__ = ('kwargs', 'athina_meta', 'started_at', 'stream')
+
+    def __init__(self, kwargs: dict, athina_meta: Optional[AthinaMeta], started_at: float):
+        self.kwargs = kwargs
+        self.athina_meta = athina_meta
+        # time.perf_counter() when the request was sent
+        self.started_at = started_at
+        self.stream: Optional[StreamAssembler] = None
+
+    @property
+    def is_streaming(self) -> bool:
+        return bool(self.kwargs.get("stream"))
+
+    def start_stream(self) -> StreamAssembler:
+        # chunks are timed from when the request was sent, not from the first read of the stream
+        self.stream = StreamAssembler(self.started_at)
+        return self.stream
+
+    def log(self, response):
+        """
+        logs a response that was not streamed
+        """
+        # log_to_athina only enqueues the record on the background exporter
+        log_to_athina(
+            result=response if version_numbers < (1, 0, 0) else response.model_dump(),
+            args=self.kwargs,
+            athina_meta=self.athina_meta,
+        )
+
+    def log_stream(self):
+        """
+        logs the completion assembled from the stream
+        """
+        log_stream_to_athina(self.stream, self.kwargs, self.athina_meta)
+
+
+class OpenAiMiddleware:
+    """
+    logs the chat completions of OpenAI clients. one middleware instruments every client,
+    and the state of each call is kept in its own OpenAiCall, so the middleware is safe
+    to use from many threads at once.
+    """
 
     def _with_athina_logging(self, func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             # Extract args from OpenAI call
-            self._args = args
-            self._kwargs = kwargs
-            self._athina_meta = kwargs.pop("athina_meta", None)
+            athina_meta = kwargs.pop("athina_meta", None)
 
             # Make the OpenAI call and measure response time
-            start_time = time.time()
-            openai_response = func(*self._args, **self._kwargs)
-            end_time = time.time()
+            start_time = time.perf_counter()
+            openai_response = func(*args, **kwargs)
+            end_time = time.perf_counter()
             response_time_ms = int((end_time - start_time) * 1000)
 
             # Return if no result was returned from OpenAI
@@ -95,17 +187,8 @@ class OpenAiMiddleware:
 
             # Construct the Athina Meta object and log to Athina
             try:
-                # Construct the Athina Meta object
-                if self._athina_meta is not None:
-                    self._athina_meta.response_time = response_time_ms
-                else:
-                    self._athina_meta = AthinaMeta(
-                        prompt_slug="default",
-                        response_time=response_time_ms,
-                        environment="default",
-                    )
-
-                return self._response_interceptor(openai_response, ("stream" in self._kwargs and self._kwargs["stream"]))
+                call = OpenAiCall(kwargs, with_response_time(athina_meta, response_time_ms), start_time)
+                return self._response_interceptor(openai_response, call)
             except Exception as e:
                 print("Exception in Athina logging: ", e)
                 traceback.print_exc()
@@ -113,117 +196,18 @@ class OpenAiMiddleware:
 
         return wrapper
 
-    def _response_interceptor(self, response, is_streaming=False,
-                            send_response: Callable[[dict], None] = None):
+    def _response_interceptor(self, response, call: OpenAiCall):
         def generator_intercept_packets():
+            stream = call.start_stream()
             for r in response:
-                self.collect_stream_inference_by_chunk(r)
+                stream.add(r)
                 yield r
-            self._log_stream_to_athina()
+            call.log_stream()
 
-        if is_streaming:
+        if call.is_streaming:
             return generator_intercept_packets()
-        else:
-            api_thread = threading.Thread(
-                target=log_to_athina,
-                kwargs={
-                    "result": response if version_numbers < (1, 0, 0) else response.model_dump(),
-                    "args": self._kwargs,
-                    "athina_meta": self._athina_meta,
-                },
-            )
-            api_thread.start()
-            return response
-
-    def _get_text_from_stream_chunk(self, stream_chunk):
-        """
-        gets the text from the stream chunk
-        """
-        try:
-            text = ''
-            choices = stream_chunk.get('choices', []) 
-            if choices and len(choices) > 0 and 'delta' in choices[0]:
-                delta = choices[0].get('delta', {})
-                if 'content' in delta and delta['content'] is not None:
-                    text = delta.get('content', '')
-
-            return text
-        except Exception as e:
-            raise e
-
-    def collect_stream_inference_by_chunk(self, stream_chunk):
-        """
-        collects the inference from the log stream of openai chat completion chunk by chunk
-        """
-        try:
-            if isinstance(stream_chunk, dict):
-                self.athina_response += self._get_text_from_stream_chunk(
-                    stream_chunk)
-            else:
-                self.athina_response += self._get_text_from_stream_chunk(
-                    stream_chunk.model_dump())
-        except Exception as e:
-            raise e
-
-    def _log_stream_to_athina(self):
-        """
-        logs the stream response to the athina
-        """
-        try:
-            prompt_tokens = self._get_prompt_tokens(
-                prompt=self._kwargs["messages"], language_model_id=self._kwargs["model"])
-            completion_tokens = self._get_completion_tokens(
-                response=self.athina_response, language_model_id=self._kwargs["model"])
-            if prompt_tokens is not None and completion_tokens is not None:
-                total_tokens = prompt_tokens + completion_tokens
-            else:
-                total_tokens = None 
-            payload = {
-                'prompt_slug': self._athina_meta.prompt_slug,
-                'prompt': self._kwargs["messages"],
-                'language_model_id': self._kwargs["model"],
-                'response': self.athina_response,
-                'response_time': self._athina_meta.response_time,
-                'context': self._athina_meta.context,
-                'environment': self._athina_meta.environment,
-                'customer_id': str(self._athina_meta.customer_id) if self._athina_meta.customer_id is not None else None,
-                'customer_user_id': str(self._athina_meta.customer_user_id) if self._athina_meta.customer_user_id is not None else None,
-                'session_id': str(self._athina_meta.session_id) if self._athina_meta.session_id is not None else None,
-                'user_query': str(self._athina_meta.user_query) if self._athina_meta.user_query is not None else None,
-                'external_reference_id': str(self._athina_meta.external_reference_id) if self._athina_meta.external_reference_id is not None else None,
-                'prompt_tokens': prompt_tokens,
-                'completion_tokens': completion_tokens,
-                'total_tokens': total_tokens,
-                'custom_attributes': self._athina_meta.custom_attributes,
-                'custom_eval_metrics': self._athina_meta.custom_eval_metrics,
-            }
-            # Remove None fields from the payload
-            payload = {k: v for k, v in payload.items() if v is not None}
-            InferenceLogger.log_inference(**payload)
-        except Exception as e:
-            raise e
-
-    def _get_prompt_tokens(self, prompt: List[Dict[str, Any]], language_model_id: str):
-        """
-        gets the prompt tokens given the prompt for the openai chat model completion
-        """
-        try:
-            tokens = get_prompt_tokens_openai_chat_completion(
-                prompt=prompt, language_model_id=language_model_id)
-            return tokens
-        except Exception as e:
-            return None
-
-    def _get_completion_tokens(self, response: str, language_model_id: str):
-        """
-        gets the completion tokens given the prompt response from the openai chat model completion
-        """
-        try:
-            tokens = get_completion_tokens_openai_chat_completion(
-                response=response, language_model_id=language_model_id)
-            return tokens
-        except Exception as e:
-            return None
+        call.log(response)
+        return response
 
     # Apply the Athina logging wrapper to OpenAI methods
     def apply_athina(self, openai_instance=None):
@@ -251,6 +235,95 @@ class OpenAiMiddleware:
                         openai_method_name, athina_method)
 
 
+class InterceptedAsyncStream:
+    """
+    an AsyncStream of chat completion chunks that collects every chunk it yields and logs
+    the completion once the stream has been read to the end. async with, close() and the
+    other attributes of the stream, like response, are delegated to the wrapped stream.
+    """
+
+    def __init__(self, stream, call: OpenAiCall):
+        self._stream = stream
+        self._call = call
+        self._iterator = self._intercept()
+
+    async def _intercept(self):
+        assembler = self._call.start_stream()
+        async for chunk in self._stream:
+            assembler.add(chunk)
+            yield chunk
+        self._call.log_stream()
+
+    def __aiter__(self):
+        return self._iterator
+
+    async def __anext__(self):
+        return await self._iterator.__anext__()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """
+        closes the stream. a stream closed before its end is not logged
+        """
+        await self._iterator.aclose()
+        await self._stream.close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class AsyncOpenAiMiddleware:
+    """
+    logs the chat completions of AsyncOpenAI clients.
+
+    coroutines of concurrent requests interleave on the event loop, so like with OpenAiMiddleware
+    the state of every call is kept in its own OpenAiCall. streams are returned wrapped in an
+    InterceptedAsyncStream that adds no awaits of its own per chunk; the finished record is
+    handed to the background exporter without blocking the event loop.
+    """
+
+    def _with_athina_logging(self, func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            athina_meta = kwargs.pop("athina_meta", None)
+
+            # Make the OpenAI call and measure response time
+            start_time = time.perf_counter()
+            openai_response = await func(*args, **kwargs)
+            end_time = time.perf_counter()
+            response_time_ms = int((end_time - start_time) * 1000)
+
+            # Return if no result was returned from OpenAI
+            if openai_response is None:
+                print("No result was returned from OpenAI")
+                return openai_response
+
+            try:
+                call = OpenAiCall(kwargs, with_response_time(athina_meta, response_time_ms), start_time)
+                if call.is_streaming:
+                    return InterceptedAsyncStream(openai_response, call)
+                call.log(openai_response)
+                return openai_response
+            except Exception as e:
+                print("Exception in Athina logging: ", e)
+                traceback.print_exc()
+                return openai_response
+
+        return wrapper
+
+    def apply_athina(self, openai_instance):
+        """
+        wraps chat.completions.create of an AsyncOpenAI client with athina logging
+        """
+        openai_method = openai_instance.chat.completions.create
+        openai_instance.chat.completions.create = self._with_athina_logging(openai_method)
+
+
 middleware = OpenAiMiddleware()
 middleware.apply_athina()
 
@@ -266,3 +339,15 @@ if version_numbers > (1, 0, 0):
 
     importlib.import_module(
         "openai").OpenAI.__init__ = new_openai_constructor
+
+    # Monkey-patch the constructor of openai.AsyncOpenAI
+    async_middleware = AsyncOpenAiMiddleware()
+    original_async_openai_constructor = importlib.import_module(
+        "openai").AsyncOpenAI.__init__
+
+    def new_async_openai_constructor(self, *args, **kwargs):
+        original_async_openai_constructor(self, *args, **kwargs)
+        async_middleware.apply_athina(self)
+
+    importlib.import_module(
+        "openai").AsyncOpenAI.__init__ = new_async_openai_constructor
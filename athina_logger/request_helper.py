@@ -1,51 +1,182 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
 import requests
-from retrying import retry
+from requests.adapters import HTTPAdapter
 
+from .compression import BodyCompressor
+from .constants import COMPRESSION, COMPRESSION_THRESHOLD, HTTP_CONNECT_TIMEOUT, HTTP_POOL_SIZE, HTTP_READ_TIMEOUT
 from .exception.custom_exception import CustomException
+from .retry_policy import RetryPolicy
+from .serializer import dumps
 
 
 class RequestHelper:
     """
     class to make requests to the athina api
+
+    all requests share one keep-alive connection pool. each thread gets its own
+    requests.Session mounted on the shared adapter, so connections are reused
+    across threads without sharing any per-session state. failed requests are
+    retried according to the shared RetryPolicy. post bodies above the compression
+    threshold are compressed when compression is enabled.
     """
+    _adapter: Optional[HTTPAdapter] = None
+    _adapter_pid: Optional[int] = None
+    _adapter_lock = threading.Lock()
+    _local = threading.local()
+    _pool_size = HTTP_POOL_SIZE
+    _timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    _retry_policy = RetryPolicy()
+    _compressor = BodyCompressor(COMPRESSION, COMPRESSION_THRESHOLD)
+
+    @classmethod
+    def configure_session(
+        cls,
+        pool_size: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+    ):
+        """
+        configures the shared connection pool. open connections are closed and
+        the new settings apply to all subsequent requests.
+        """
+        with cls._adapter_lock:
+            if pool_size is not None:
+                cls._pool_size = pool_size
+            if connect_timeout is not None or read_timeout is not None:
+                cls._timeout = (
+                    connect_timeout if connect_timeout is not None else cls._timeout[0],
+                    read_timeout if read_timeout is not None else cls._timeout[1],
+                )
+            if cls._adapter is not None:
+                cls._adapter.close()
+            cls._adapter = None
+            cls._adapter_pid = None
+
+    @classmethod
+    def _get_adapter(cls) -> HTTPAdapter:
+        # pooled connections must not be shared with a forked child process
+        pid = os.getpid()
+        adapter = cls._adapter
+        if adapter is not None and cls._adapter_pid == pid:
+            return adapter
+        with cls._adapter_lock:
+            if cls._adapter is None or cls._adapter_pid != pid:
+                cls._adapter = HTTPAdapter(pool_connections=cls._pool_size, pool_maxsize=cls._pool_size)
+                cls._adapter_pid = pid
+            return cls._adapter
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        """
+        returns the calling thread's session, backed by the shared connection pool.
+        """
+        adapter = cls._get_adapter()
+        session = getattr(cls._local, 'session', None)
+        if session is None or session.get_adapter('https://') is not adapter:
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            cls._local.session = session
+        return session
+
+    @classmethod
+    def configure_retries(cls, retry_policy: RetryPolicy):
+        """
+        replaces the retry policy used for all requests to the athina api.
+        """
+        cls._retry_policy = retry_policy
+
+    @classmethod
+    def configure_compression(cls, encoding: str, threshold: Optional[int] = None, level: Optional[int] = None):
+        """
+        sets the compression of post bodies: none, gzip or zstd. bodies smaller
+        than threshold bytes are always sent uncompressed.
+        """
+        cls._compressor = BodyCompressor(
+            encoding, threshold if threshold is not None else cls._compressor.threshold, level)
+
     @staticmethod
-    @retry(wait_fixed=100, stop_max_attempt_number=2)
-    def make_post_request(endpoint: str, payload: dict, headers: dict):
-        try:
-            response = requests.post(
-                endpoint,
-                json=payload,
-                headers=headers,
-            )
-            if response.status_code != 200 and response.status_code != 201:
-                response_json = response.json()
-                error_message = response_json.get('error', 'Unknown Error')
-                details_message = response_json.get(
-                    'details', {}).get('message', 'No Details')
-                raise CustomException(
-                    response.status_code, f'{error_message}: {details_message}')
-        except requests.exceptions.RequestException as e:
-            raise e
-        except Exception as e:
-            raise e
+    def prepare_body(payload: Optional[dict], data: Optional[bytes], headers: dict) -> Tuple[bytes, Dict[str, str]]:
+        """
+        returns the encoded body and headers to post. the payload is serialized and
+        compressed once here, not on every retry.
+        """
+        if data is None:
+            data = dumps(payload)
+        data, content_encoding = RequestHelper._compressor.compress(data)
+        headers = {**headers, 'Content-Type': 'application/json'}
+        if content_encoding is not None:
+            headers['Content-Encoding'] = content_encoding
+        return data, headers
+
+    @staticmethod
+    def make_post_request(endpoint: str, payload: Optional[dict], headers: dict, data: Optional[bytes] = None):
+        """
+        posts the payload as json. if data is given, it is sent as an already encoded json body instead.
+        """
+        data, headers = RequestHelper.prepare_body(payload, data, headers)
+        RequestHelper._send_with_retries(lambda: RequestHelper.get_session().post(
+            endpoint,
+            data=data,
+            headers=headers,
+            timeout=RequestHelper._timeout,
+        ), success_status_codes=(200, 201))
 
     @staticmethod
-    @retry(wait_fixed=100, stop_max_attempt_number=2)
     def make_patch_request(endpoint: str, payload: dict, headers: dict):
+        RequestHelper._send_with_retries(lambda: RequestHelper.get_session().patch(
+            endpoint,
+            json=payload,
+            headers=headers,
+            timeout=RequestHelper._timeout,
+        ), success_status_codes=(200,))
+
+    @staticmethod
+    def _send_with_retries(send: Callable[[], requests.Response], success_status_codes: Tuple[int, ...]) -> requests.Response:
+        policy = RequestHelper._retry_policy
+        policy.budget.record_request()
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            try:
+                response = send()
+                if response.status_code in success_status_codes:
+                    return response
+                error = RequestHelper.error_from_response(response)
+                retryable = policy.is_retryable_status(response.status_code)
+                retry_after = policy.parse_retry_after(response.headers.get('Retry-After'))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+                retryable = True
+            if not policy.should_retry(attempt, retryable):
+                raise error
+            time.sleep(policy.backoff(attempt, retry_after))
+
+    @staticmethod
+    def is_transient_error(error: Exception) -> bool:
+        """
+        returns True if a request failed with an error that may go away when it is sent again later.
+        """
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        return isinstance(error, CustomException) and RequestHelper._retry_policy.is_retryable_status(error.status_code)
+
+    @staticmethod
+    def error_from_response(response: Any) -> CustomException:
+        """
+        builds the exception for an unsuccessful response from its json error body.
+        """
         try:
-            response = requests.patch(
-                endpoint,
-                json=payload,
-                headers=headers,
-            )
-            if response.status_code != 200:
-                response_json = response.json()
-                error_message = response_json.get('error', 'Unknown Error')
-                details_message = response_json.get(
-                    'details', {}).get('message', 'No Details')
-                raise CustomException(
-                    response.status_code, f'{error_message}: {details_message}')
-        except requests.exceptions.RequestException as e:
-            raise e
-        except Exception as e:
-            raise e
+            response_json = response.json()
+            error_message = response_json.get('error', 'Unknown Error')
+            details_message = response_json.get(
+                'details', {}).get('message', 'No Details')
+        except Exception:
+            error_message, details_message = 'Unknown Error', 'No Details'
+        return CustomException(
+            response.status_code, f'{error_message}: {details_message}')
@@ -0,0 +1,121 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from .constants import (
+    RETRY_BASE_DELAY,
+    RETRY_BUDGET_MIN_PER_SECOND,
+    RETRY_BUDGET_RATIO,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY,
+    RETRY_MAX_RETRY_AFTER,
+)
+
+
+class RetryBudget:
+    """
+    process-wide token bucket limiting retries to a fraction of the requests made.
+
+    every request earns `ratio` of a retry and the bucket also refills by
+    `min_retries_per_second`, so a few retries are always possible, but during an
+    outage retries cannot multiply the load on the server.
+    """
+
+    def __init__(
+        self,
+        ratio: float = RETRY_BUDGET_RATIO,
+        min_retries_per_second: float = RETRY_BUDGET_MIN_PER_SECOND,
+        max_tokens: float = 10,
+    ):
+        self._ratio = ratio
+        self._min_retries_per_second = min_retries_per_second
+        self._max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, earned: float = 0):
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self._max_tokens, self._tokens + earned + elapsed * self._min_retries_per_second)
+
+    def record_request(self):
+        with self._lock:
+            self._refill(self._ratio)
+
+    def try_spend(self) -> bool:
+        """
+        takes one retry from the budget, returns False if the budget is exhausted.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RetryPolicy:
+    """
+    decides whether and when a failed request to the athina api is retried.
+
+    only transient failures are retried: connection errors, timeouts and the status
+    codes in RETRYABLE_STATUS_CODES. other 4xx responses are permanent. retries wait
+    with exponential backoff and full jitter, or for the server's Retry-After, and
+    draw from a process-wide retry budget.
+    """
+    RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+    def __init__(
+        self,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        max_retry_after: float = RETRY_MAX_RETRY_AFTER,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.budget = budget if budget is not None else RetryBudget()
+
+    def is_retryable_status(self, status_code: Optional[int]) -> bool:
+        return status_code in self.RETRYABLE_STATUS_CODES
+
+    def should_retry(self, attempt: int, retryable: bool) -> bool:
+        """
+        returns True if a request that failed on the given attempt (starting at 1) should be retried.
+        """
+        return retryable and attempt < self.max_attempts and self.budget.try_spend()
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        seconds to wait before the next attempt, after the given attempt (starting at 1) failed.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """
+        parses a Retry-After header given either in seconds or as an http date.
+        """
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,83 @@
+import json
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .constants import SERIALIZER
+
+SERIALIZERS = ('auto', 'orjson', 'json')
+
+
+def default(value: Any) -> Any:
+    """
+    fallback for values json cannot encode natively: custom objects are replaced
+    by a placeholder, anything else by its string representation.
+    """
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, '__dict__'):
+        return f"<{value.__class__.__name__} object>"
+    return str(value)
+
+
+class JsonSerializer:
+    """
+    encodes payloads with the standard library json module.
+    """
+    name = 'json'
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=default, separators=(',', ':')).encode('utf-8')
+
+
+class OrjsonSerializer:
+    """
+    encodes payloads with orjson, which is several times faster than json and encodes straight to bytes.
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError('orjson is not installed, install it with `pip install orjson`')
+        self._fallback = JsonSerializer()
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers larger than 64 bits, which orjson does not support
+            return self._fallback.dumps(obj)
+
+
+def create_serializer(name: str = 'auto'):
+    if name not in SERIALIZERS:
+        raise ValueError(f'serializer must be one of {", ".join(SERIALIZERS)}, got {name}')
+    if name == 'json' or (name == 'auto' and orjson is None):
+        return JsonSerializer()
+    return OrjsonSerializer()
+
+
+_serializer = create_serializer(SERIALIZER)
+
+
+def get_serializer():
+    return _serializer
+
+
+def set_serializer(serializer: Optional[Any]):
+    """
+    replaces the serializer used for all payloads. any object with a dumps(obj) -> bytes
+    method can be used; None restores the default.
+    """
+    global _serializer
+    _serializer = serializer if serializer is not None else create_serializer(SERIALIZER)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    encodes a payload to json bytes with the configured serializer.
+    """
+    return _serializer.dumps(obj)
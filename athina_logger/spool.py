@@ -0,0 +1,232 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+from .constants import SPOOL_FSYNC, SPOOL_FSYNC_INTERVAL, SPOOL_MAX_BYTES, SPOOL_SEGMENT_BYTES
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+
+def _try_lock(lock_file) -> bool:
+    # exclusive, non-blocking and released by the os when the process exits
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+class DiskSpool:
+    """
+    append-only, on-disk write-ahead spool for requests that could not be sent.
+
+    entries are appended as json lines to numbered segment files in the spool
+    directory. when the spool grows past max_bytes, the oldest segments are evicted.
+    segments are handed out oldest first for replay and deleted once replayed.
+
+    entries include the request headers, so the spool directory and its files are
+    created readable by the current user only.
+
+    the directory can be shared by processes (e.g. forked workers) and by several spools of one
+    process: every spool claims a numbered subdirectory of its own, held with an exclusive lock
+    until the spool is closed or its process exits. subdirectories left by processes that exited
+    are claimed again, so their segments are replayed. max_bytes applies per subdirectory.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = SPOOL_MAX_BYTES,
+        segment_bytes: int = SPOOL_SEGMENT_BYTES,
+        fsync: str = SPOOL_FSYNC,
+        fsync_interval: float = SPOOL_FSYNC_INTERVAL,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f'fsync must be one of {", ".join(FSYNC_POLICIES)}, got {fsync}')
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self._root = directory
+        self._max_bytes = max_bytes
+        self._segment_bytes = segment_bytes
+        self._fsync = fsync
+        self._fsync_interval = fsync_interval
+        self._last_fsync = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_path: Optional[str] = None
+        self._file_size = 0
+        self._lock_file = None
+        self._pid: Optional[int] = None
+        self.evicted_segments = 0
+        self._claim()
+
+    @property
+    def directory(self) -> str:
+        """
+        the subdirectory claimed by this spool.
+        """
+        return self._directory
+
+    @property
+    def size(self) -> int:
+        """
+        total size of the spooled entries in bytes.
+        """
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def append(self, endpoint: str, headers: Dict[str, str], body: bytes):
+        """
+        appends a request to the active segment, evicting the oldest segments if the spool is full.
+        """
+        line = json.dumps({'endpoint': endpoint, 'headers': headers, 'body': body.decode('utf-8')}).encode('utf-8') + b'\n'
+        with self._lock:
+            self._ensure_claimed()
+            if self._file is None or (self._file_size and self._file_size + len(line) > self._segment_bytes):
+                self._roll()
+            self._file.write(line)
+            self._file.flush()
+            self._file_size += len(line)
+            self._size += len(line)
+            now = time.monotonic()
+            if self._fsync == 'always' or (self._fsync == 'interval' and now - self._last_fsync >= self._fsync_interval):
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+            self._evict()
+
+    def take_oldest(self) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        returns the path and entries of the oldest segment, or None if the spool is empty.
+        new entries go to a fresh segment from now on, so the returned one is no longer appended to.
+        """
+        with self._lock:
+            self._ensure_claimed()
+            while True:
+                if not self._segments:
+                    return None
+                path = self._segments[0]
+                if self._file_path == path:
+                    self._close_active()
+                try:
+                    with open(path, 'rb') as segment:
+                        lines = segment.read().splitlines()
+                    break
+                except FileNotFoundError:
+                    # deleted from outside the spool, its size is no longer known
+                    self._segments.pop(0)
+                    self._size = sum(os.path.getsize(path) for path in self._segments)
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # a partially written line left behind by a crash
+                continue
+        return path, entries
+
+    def complete(self, path: str, remaining: List[Dict[str, Any]]):
+        """
+        marks a segment taken with take_oldest as replayed, keeping only the remaining entries.
+        """
+        with self._lock:
+            self._ensure_claimed()
+            if path not in self._segments:
+                # evicted while it was being replayed
+                return
+            self._size -= os.path.getsize(path)
+            if not remaining:
+                os.remove(path)
+                self._segments.remove(path)
+                return
+            temporary_path = path + '.tmp'
+            with open(os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as segment:
+                for entry in remaining:
+                    segment.write(json.dumps(entry).encode('utf-8') + b'\n')
+                segment.flush()
+                if self._fsync != 'never':
+                    os.fsync(segment.fileno())
+            os.replace(temporary_path, path)
+            self._size += os.path.getsize(path)
+
+    def close(self):
+        """
+        closes the active segment and releases the subdirectory. using the spool again claims one again.
+        """
+        with self._lock:
+            self._release()
+
+    def _ensure_claimed(self):
+        # after close(), and in a forked child, which must not share the subdirectory of its parent
+        if self._lock_file is None or self._pid != os.getpid():
+            self._claim()
+
+    def _claim(self):
+        self._release()
+        index = 0
+        while True:
+            directory = os.path.join(self._root, f'{index:04d}')
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            lock_file = open(os.open(os.path.join(directory, '.lock'), os.O_WRONLY | os.O_CREAT, 0o600), 'wb')
+            if _try_lock(lock_file):
+                break
+            lock_file.close()
+            index += 1
+        self._directory = directory
+        self._lock_file = lock_file
+        self._pid = os.getpid()
+        self._segments: List[str] = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.spool'))
+        self._size = sum(os.path.getsize(path) for path in self._segments)
+        self._next_sequence = int(os.path.basename(self._segments[-1]).split('.')[0]) + 1 if self._segments else 0
+
+    def _release(self):
+        if self._pid == os.getpid():
+            self._close_active()
+        else:
+            # the segment and the lock of the parent process, closing the inherited copies keeps them open there
+            if self._file is not None:
+                self._file.close()
+            self._file = None
+            self._file_path = None
+            self._file_size = 0
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _roll(self):
+        self._close_active()
+        path = os.path.join(self._directory, f'{self._next_sequence:020d}.spool')
+        self._next_sequence += 1
+        self._file = open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600), 'ab')
+        self._file_path = path
+        self._file_size = 0
+        self._segments.append(path)
+
+    def _close_active(self):
+        if self._file is None:
+            return
+        if self._fsync != 'never':
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        self._file_path = None
+        self._file_size = 0
+
+    def _evict(self):
+        while self._size > self._max_bytes and len(self._segments) > 1:
+            oldest = self._segments.pop(0)
+            self._size -= os.path.getsize(oldest)
+            os.remove(oldest)
+            self.evicted_segments += 1
@@ -3,6 +3,8 @@ import datetime
 from typing import Optional
 from pydantic import BaseModel, Field
 
+from .util import to_iso
+
 class TraceModel(BaseModel):
     name: str
     start_time: str = Field(default_factory=datetime.datetime.utcnow)
@@ -25,3 +27,96 @@ class SpanModel(BaseModel):
     input: Optional[dict] = None
     output: Optional[dict] = None
     version: Optional[str] = None
+
+
+class SpanRecord:
+    """
+    compact, mutable record of a span's fields, used instead of a SpanModel per span.
+    attributes, input and output are copied from the arguments, or only allocated when they are first used.
+    start and end times are kept as datetimes and only formatted when the span is exported,
+    start_ns is the time.perf_counter_ns() value at the start, if the start was recorded by the sdk.
+    the pydantic SpanModel is only built when a span is converted with to_model().
+    """
+    __slots__ = (
+        'name', 'start_time', 'start_ns', 'span_type', 'end_time', 'duration', 'status',
+        '_attributes', '_input', '_output', 'version',
+    )
+    def __init__(
+        self,
+        name: str,
+        start_time: datetime.datetime,
+        start_ns: Optional[int] = None,
+        span_type: str = "span",
+        end_time: Optional[datetime.datetime] = None,
+        duration: Optional[int] = None,
+        status: Optional[str] = None,
+        attributes: Optional[dict] = None,
+        input: Optional[dict] = None,
+        output: Optional[dict] = None,
+        version: Optional[str] = None,
+    ):
+        self.name = name
+        self.start_time = start_time
+        self.start_ns = start_ns
+        self.span_type = span_type
+        self.end_time = end_time
+        self.duration = duration
+        self.status = status
+        # copied like SpanModel did, the caller may pass the same dict to many spans
+        self._attributes = dict(attributes) if attributes else None
+        self._input = dict(input) if input else None
+        self._output = dict(output) if output else None
+        self.version = version
+
+    @property
+    def attributes(self) -> dict:
+        if self._attributes is None:
+            self._attributes = {}
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, value: Optional[dict]):
+        self._attributes = value
+
+    @property
+    def input(self) -> dict:
+        if self._input is None:
+            self._input = {}
+        return self._input
+
+    @input.setter
+    def input(self, value: Optional[dict]):
+        self._input = value
+
+    @property
+    def output(self) -> dict:
+        if self._output is None:
+            self._output = {}
+        return self._output
+
+    @output.setter
+    def output(self, value: Optional[dict]):
+        self._output = value
+
+    def fields(self) -> dict:
+        """
+        returns the fields as a new dict, in the same shape as SpanModel.model_dump() without copying the values.
+        """
+        return {
+            'name': self.name,
+            'start_time': to_iso(self.start_time),
+            'span_type': self.span_type,
+            'end_time': to_iso(self.end_time),
+            'duration': self.duration,
+            'status': self.status,
+            'attributes': self._attributes if self._attributes is not None else {},
+            'input': self._input if self._input is not None else {},
+            'output': self._output if self._output is not None else {},
+            'version': self.version,
+        }
+
+    def to_model(self) -> SpanModel:
+        return SpanModel(**self.fields())
+
+    def model_dump(self) -> dict:
+        return self.to_model().model_dump()
@@ -1,9 +1,28 @@
 import datetime
-from typing import Any, Dict, List, Optional, Union
-from .models import SpanModel
-from .util import get_utc_time, remove_none_values
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+from .models import SpanRecord
+from .util import end_timing, normalize, remove_none_values
 from langchain.schema.document import Document
 
+# generation parameters stored in the span attributes, in the order they are passed to _set_generation_attributes
+GENERATION_ATTRIBUTES = (
+    "prompt", "response", "prompt_slug", "language_model_id", "environment", "functions", "function_call_response",
+    "tools", "tool_calls", "external_reference_id", "customer_id", "customer_user_id", "session_id", "user_query",
+    "prompt_tokens", "completion_tokens", "total_tokens", "response_time", "context", "expected_response",
+    "custom_attributes", "cost", "custom_eval_metrics",
+)
+
+
+def _set_generation_attributes(attributes: Optional[dict], values: tuple) -> Optional[dict]:
+    for key, value in zip(GENERATION_ATTRIBUTES, values):
+        if value is not None:
+            if attributes is None:
+                attributes = {}
+            attributes[key] = value
+    return attributes
+
+
 class Span:
 
     def __init__(
@@ -19,34 +38,47 @@ class Span:
         duration: Optional[int] = None,
         version: Optional[str] = None,
     ):
+        start_ns = None
         if start_time is None:
-            start_time = datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)
-        else:
-            start_time = start_time
-        self._span = SpanModel(
+            # durations are measured from the monotonic clock when the sdk records the start itself
+            start_ns = time.perf_counter_ns()
+            start_time = datetime.datetime.now(datetime.timezone.utc)
+        self._span = SpanRecord(
             name=name,
             span_type=span_type,
-            start_time=start_time.isoformat(),
-            end_time=end_time.isoformat() if end_time else None,
+            start_time=start_time,
+            start_ns=start_ns,
+            end_time=end_time,
             status=status,
-            attributes=attributes or {},
-            input=input or {},
-            output=output or {},
+            attributes=attributes,
+            input=input,
+            output=output,
             duration=duration,
             version=version,
         )
         self._children = []
+        # called with the span when it is ended, used by traces exported incrementally
+        self._on_end: Optional[Callable[["Span"], None]] = None
 
     def __repr__(self):
         return f"Span(name={self._span.name}, dict={remove_none_values(self.to_dict())}, children={self._children})"
 
     def to_dict(self):
         span_dict = self._span.model_dump()
-        if "input_documents" in self._span.input:
+        if self._span._input and "input_documents" in self._span._input:
             self._span.input['input_documents'] = [doc.page_content if isinstance(doc, Document) else doc for doc in self._span.input["input_documents"]]
         span_dict["children"] = [child.to_dict() for child in self._children]
         return span_dict
 
+    def _export_dict(self):
+        # single pass equivalent of remove_none_values + sanitize_dict over to_dict(),
+        # reading the model fields directly instead of copying them with model_dump
+        if self._span._input and "input_documents" in self._span._input:
+            self._span.input['input_documents'] = [doc.page_content if isinstance(doc, Document) else doc for doc in self._span.input["input_documents"]]
+        span_dict = dict(normalize(self._span.fields()))
+        span_dict["children"] = [child._export_dict() for child in self._children]
+        return span_dict
+
     def add_span(self, span: "Span"):
         self._children.append(span)
 
@@ -65,13 +97,13 @@ class Span:
     ):
         span = Span(
             name=name,
-            start_time=(start_time or datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)),
+            start_time=start_time,
             end_time=end_time,
             span_type=span_type,
             status=status,
-            attributes=attributes or {},
-            input=input or {},
-            output=output or {},
+            attributes=attributes,
+            input=input,
+            output=output,
             duration=duration,
             version=version,
         )
@@ -178,15 +210,25 @@ class Span:
             self._span.attributes.update(attributes)
 
     def end(self, end_time: Optional[datetime.datetime] = None):
+        self._end(end_time, time.perf_counter_ns() if end_time is None else None)
+        if self._on_end is not None:
+            self._on_end(self)
+
+    def _count_spans(self) -> int:
+        return 1 + sum(child._count_spans() for child in self._children)
+
+    def _end(self, end_time: Optional[datetime.datetime], end_ns: Optional[int]):
+        # end_ns is the monotonic end, used by spans that recorded a monotonic start
         try:
-            end_time = get_utc_time(end_time)
-            if self._span.end_time is None:
-                self._span.end_time = end_time.replace(tzinfo=datetime.timezone.utc).isoformat()
-            if self._span.duration is None:
-                delta = (end_time - get_utc_time(datetime.datetime.fromisoformat(self._span.start_time)))
-                self._span.duration = int((delta.seconds * 1000) + (delta.microseconds // 1000))
+            span = self._span
+            if span.end_time is None or span.duration is None:
+                span_end_time, duration = end_timing(span.start_time, span.start_ns, end_time, end_ns)
+                if span.end_time is None:
+                    span.end_time = span_end_time
+                if span.duration is None:
+                    span.duration = duration
             for child in self._children:
-                child.end(end_time)
+                child._end(end_time, end_ns)
         except Exception as e:
             print(f"Error ending span: {e}")
 
@@ -227,37 +269,14 @@ class Generation(Span):
         cost: Optional[float] = None,
         custom_eval_metrics: Optional[Dict] = None,
     ):
-        if attributes is None:
-            attributes = {}
-        additional_attributes = {
-            "prompt": prompt,
-            "response": response,
-            "prompt_slug": prompt_slug,
-            "language_model_id": language_model_id,
-            "environment": environment,
-            "functions": functions,
-            "function_call_response": function_call_response,
-            "tools": tools,
-            "tool_calls": tool_calls,
-            "external_reference_id": external_reference_id,
-            "customer_id": customer_id,
-            "customer_user_id": customer_user_id,
-            "session_id": session_id,
-            "user_query": user_query,
-            "prompt_tokens": prompt_tokens,
-            "completion_tokens": completion_tokens,
-            "total_tokens": total_tokens,
-            "response_time": response_time,
-            "context": context,
-            "expected_response": expected_response,
-            "custom_attributes": custom_attributes,
-            "cost": cost,
-            "custom_eval_metrics": custom_eval_metrics,
-        }
-        # Update 'attributes' only with non-None values from 'additional_attributes'
-        for key, value in additional_attributes.items():
-            if value is not None:
-                attributes[key] = value
+        # only the given values are set, without building a dict of all generation attributes.
+        # the caller's attributes are not changed
+        attributes = _set_generation_attributes(dict(attributes) if attributes else None, (
+            prompt, response, prompt_slug, language_model_id, environment, functions, function_call_response,
+            tools, tool_calls, external_reference_id, customer_id, customer_user_id, session_id, user_query,
+            prompt_tokens, completion_tokens, total_tokens, response_time, context, expected_response,
+            custom_attributes, cost, custom_eval_metrics,
+        ))
         super().__init__(
             name=name,
             start_time=start_time,
@@ -302,38 +321,16 @@ class Generation(Span):
         cost: Optional[float] = None,
         custom_eval_metrics: Optional[Dict] = None,
     ):
-        if self._span.attributes is None:
-            self._span.attributes = {}
-        attributes = {
-            "prompt": prompt if prompt is not None else self._span.attributes.get("prompt"),
-            "response": response if response is not None else self._span.attributes.get("response"),
-            "prompt_slug": prompt_slug if prompt_slug is not None else self._span.attributes.get("prompt_slug"),
-            "language_model_id": language_model_id if language_model_id is not None else self._span.attributes.get("language_model_id"),
-            "environment": environment if environment is not None else self._span.attributes.get("environment"),
-            "functions": functions if functions is not None else self._span.attributes.get("functions"),
-            "function_call_response": function_call_response if function_call_response is not None else self._span.attributes.get("function_call_response"),
-            "tools": tools if tools is not None else self._span.attributes.get("tools"),
-            "tool_calls": tool_calls if tool_calls is not None else self._span.attributes.get("tool_calls"),
-            "external_reference_id": external_reference_id if external_reference_id is not None else self._span.attributes.get("external_reference_id"),
-            "customer_id": customer_id if customer_id is not None else self._span.attributes.get("customer_id"),
-            "customer_user_id": customer_user_id if customer_user_id is not None else self._span.attributes.get("customer_user_id"),
-            "session_id": session_id if session_id is not None else self._span.attributes.get("session_id"),
-            "user_query": user_query if user_query is not None else self._span.attributes.get("user_query"),
-            "prompt_tokens": prompt_tokens if prompt_tokens is not None else self._span.attributes.get("prompt_tokens"),
-            "completion_tokens": completion_tokens if completion_tokens is not None else self._span.attributes.get("completion_tokens"),
-            "total_tokens": total_tokens if total_tokens is not None else self._span.attributes.get("total_tokens"),
-            "response_time": response_time if response_time is not None else self._span.attributes.get("response_time"),
-            "context": context if context is not None else self._span.attributes.get("context"),
-            "expected_response": expected_response if expected_response is not None else self._span.attributes.get("expected_response"),
-            "custom_attributes": custom_attributes if custom_attributes is not None else self._span.attributes.get("custom_attributes"),
-            "cost": cost if cost is not None else self._span.attributes.get("cost"),
-            "custom_eval_metrics": custom_eval_metrics if custom_eval_metrics is not None else self._span.attributes.get("custom_eval_metrics"),
-        }
+        self._span.attributes = _set_generation_attributes(self._span._attributes, (
+            prompt, response, prompt_slug, language_model_id, environment, functions, function_call_response,
+            tools, tool_calls, external_reference_id, customer_id, customer_user_id, session_id, user_query,
+            prompt_tokens, completion_tokens, total_tokens, response_time, context, expected_response,
+            custom_attributes, cost, custom_eval_metrics,
+        ))
         super().update(
             end_time=end_time,
             status=status,
             input=input,
             output=output,
             duration=duration,
-            attributes=attributes,
         )
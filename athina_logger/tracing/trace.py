@@ -1,18 +1,28 @@
-import asyncio
-import json
 import datetime
 import threading
-from typing import Any, Dict, List, Optional, Union
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from .span import Generation, Span
 from .models import TraceModel
-from .util import get_utc_time, remove_none_values, sanitize_dict
+from .util import end_timing, get_utc_time, normalize, remove_none_values
 from athina_logger.api_key import AthinaApiKey
-from athina_logger.constants import API_BASE_URL
-from athina_logger.request_helper import RequestHelper
+from athina_logger.async_inference_logger import AsyncInferenceLogger
+from athina_logger.async_request_helper import AsyncRequestHelper
+from athina_logger.constants import API_BASE_URL, TRACE_CHUNK_SPANS, TRACE_INCREMENTAL_EXPORT
+from athina_logger.exporter import BackgroundExporter, ExportRecord
 from langchain.schema.document import Document
 
 class Trace(AthinaApiKey):
+    """
+    a trace of spans, uploaded to athina when it is ended.
+
+    with incremental_export, every top-level span is released from memory when it is ended:
+    completed spans are uploaded in chunks of about TRACE_CHUNK_SPANS spans to the trace chunk
+    endpoint, keyed by trace_id. the trace itself is uploaded at the end with the remaining spans
+    and the number of chunks sent before it, so the server can assemble the full trace.
+    """
     _trace: TraceModel
     _spans: list[Span]
 
@@ -27,10 +37,16 @@ class Trace(AthinaApiKey):
         output: Optional[dict] = None,
         duration: Optional[int] = None,
         version: Optional[str] = None,
+        incremental_export: bool = TRACE_INCREMENTAL_EXPORT,
     ):        
+        self._start_ns = None
+        if start_time is None:
+            self._start_ns = time.perf_counter_ns()
+            start_time = datetime.datetime.now(datetime.timezone.utc)
+        self._start_time = start_time
         self._trace = TraceModel(
             name=name,
-            start_time=(start_time or datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)).isoformat(),
+            start_time=start_time.isoformat(),
             end_time=end_time.isoformat() if end_time else None,
             status=status,
             attributes=attributes or {},
@@ -40,12 +56,19 @@ class Trace(AthinaApiKey):
             version=version,
         )
         self._spans = []
+        self.trace_id = str(uuid.uuid4())
+        self._incremental_export = incremental_export
+        self._lock = threading.Lock()
+        # ended top-level spans waiting to be uploaded in the next chunk
+        self._completed_spans: List[Span] = []
+        self._completed_span_count = 0
+        self._chunk_count = 0
 
     def __repr__(self):
         return f"Trace(name={self._trace.name}, dict={remove_none_values(self.to_dict())},  spans={self._spans})"
 
     def add_span(self, span: Span):
-        self._spans.append(span)
+        self._add(span)
 
     def create_span(
         self,
@@ -62,21 +85,21 @@ class Trace(AthinaApiKey):
     )-> Span:
         span = Span(
             name=name,
-            start_time=(start_time or datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)),
+            start_time=start_time,
             end_time=end_time,
             span_type=span_type,
             status=status,
-            attributes=attributes or {},
-            input=input or {},
-            output=output or {},
+            attributes=attributes,
+            input=input,
+            output=output,
             duration=duration,
             version=version,
         )
-        self._spans.append(span)
+        self._add(span)
         return span
 
     def add_generation(self, generation: Generation):
-        self._spans.append(generation)
+        self._add(generation)
 
     def create_generation(
         self,
@@ -116,7 +139,7 @@ class Trace(AthinaApiKey):
     ) -> Generation:
         span = Generation(
             name=name,
-            start_time=(start_time or datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)),
+            start_time=start_time,
             end_time=end_time,
             span_type=span_type,
             status=status,
@@ -149,14 +172,51 @@ class Trace(AthinaApiKey):
             cost=cost,
             custom_eval_metrics=custom_eval_metrics,
         )
-        self._spans.append(span)
+        self._add(span)
         return span
-    
+
+    def _add(self, span: Span):
+        if self._incremental_export:
+            span._on_end = self._span_ended
+        self._spans.append(span)
+
+    def _span_ended(self, span: Span):
+        with self._lock:
+            try:
+                self._spans.remove(span)
+            except ValueError:
+                # ended before, or the trace has already been ended
+                return
+            self._completed_spans.append(span)
+            self._completed_span_count += span._count_spans()
+            if self._completed_span_count < TRACE_CHUNK_SPANS:
+                return
+            spans, self._completed_spans, self._completed_span_count = self._completed_spans, [], 0
+            sequence = self._chunk_count
+            self._chunk_count += 1
+        try:
+            BackgroundExporter.get_instance().submit(ExportRecord(
+                endpoint=f'{API_BASE_URL}/api/v1/trace/sdk/chunk',
+                payload=lambda: {
+                    "trace_id": self.trace_id,
+                    "sequence": sequence,
+                    "spans": [span._export_dict() for span in spans],
+                },
+                headers={"athina-api-key": Trace.get_api_key(), "Content-Type": "application/json"},
+            ))
+        except Exception as e:
+            print("Error exporting trace chunk: ", e)
+
     def to_dict(self):
         trace_dict = self._trace.model_dump()
         trace_dict["spans"] = [span.to_dict() for span in self._spans]
         return trace_dict
 
+    def _export_dict(self, fields: Optional[Dict[str, Any]] = None, spans: Optional[List[Span]] = None):
+        trace_dict = dict(normalize(self._trace.__dict__ if fields is None else fields))
+        trace_dict["spans"] = [span._export_dict() for span in (self._spans if spans is None else spans)]
+        return trace_dict
+
     def update(
         self,
         end_time: Optional[datetime.datetime] = None,
@@ -173,23 +233,64 @@ class Trace(AthinaApiKey):
         if duration:
             self._trace.duration = duration
 
-    async def _log_trace_async(self, request_dict: Dict[str, Any]):
-        RequestHelper.make_post_request(endpoint=f'{API_BASE_URL}/api/v1/trace/sdk', payload=request_dict, headers={
-            "athina-api-key": Trace.get_api_key(), "Content-Type": "application/json"
-        })
+    def _freeze(self, end_time: Optional[datetime.datetime] = None) -> Callable[[], Dict[str, Any]]:
+        """
+        ends the trace and snapshots its fields and spans. returns a function that ends
+        the spans and builds the payload later, so the caller does not pay for walking the span tree.
+        """
+        # both clocks are read now: spans with a monotonic start end at end_ns, the others at end_time,
+        # not when the exporter gets to them
+        end_ns = time.perf_counter_ns() if end_time is None else None
+        end_time = get_utc_time(end_time)
+        if self._trace.end_time is None or self._trace.duration is None:
+            trace_end_time, duration = end_timing(self._start_time, self._start_ns, end_time, end_ns)
+            if self._trace.end_time is None:
+                self._trace.end_time = trace_end_time.isoformat()
+            if self._trace.duration is None:
+                self._trace.duration = duration
+        fields = dict(self._trace.__dict__)
+        if self._incremental_export:
+            with self._lock:
+                spans = self._completed_spans + self._spans
+                self._spans, self._completed_spans, self._completed_span_count = [], [], 0
+                fields["trace_id"] = self.trace_id
+                fields["chunk_count"] = self._chunk_count
+        else:
+            spans = list(self._spans)
+
+        def build_payload() -> Dict[str, Any]:
+            for span in spans:
+                span._end(end_time, end_ns)
+            return self._export_dict(fields, spans)
+        return build_payload
 
     def end(self, end_time: Optional[datetime.datetime] = None):
+        """
+        ends the trace and hands it to the background exporter, which ends the spans,
+        serializes the trace and sends it off the caller's thread.
+        """
         try:      
-            end_time = get_utc_time(end_time)
-            for span in self._spans:
-                span.end(end_time)
-            if self._trace.end_time is None:
-                self._trace.end_time =  end_time.replace(tzinfo=datetime.timezone.utc).isoformat()
-            if self._trace.duration is None:
-                delta = (end_time - get_utc_time(datetime.datetime.fromisoformat(self._trace.start_time)))
-                self._trace.duration = int((delta.seconds * 1000) + (delta.microseconds // 1000))
-            request_dict = remove_none_values(self.to_dict())
-            request_dict = sanitize_dict(request_dict)
-            threading.Thread(target=lambda: asyncio.run(self._log_trace_async(request_dict))).start()
+            BackgroundExporter.get_instance().submit(ExportRecord(
+                endpoint=f'{API_BASE_URL}/api/v1/trace/sdk',
+                payload=self._freeze(end_time),
+                headers={"athina-api-key": Trace.get_api_key(), "Content-Type": "application/json"},
+            ))
+        except Exception as e:
+            print("Error ending trace: ", e)
+
+    async def end_async(self, end_time: Optional[datetime.datetime] = None):
+        """
+        ends the trace from a running event loop. the upload, including serializing the
+        trace, is scheduled as a task on the loop using its shared async client, without starting a thread.
+        """
+        try:
+            AsyncInferenceLogger.schedule(self._send_async(self._freeze(end_time)))
         except Exception as e:
-            print("Error ending trace: ", e)
\ No newline at end of file
+            print("Error ending trace: ", e)
+
+    async def _send_async(self, build_payload: Callable[[], Dict[str, Any]]):
+        await AsyncRequestHelper.make_post_request(
+            endpoint=f'{API_BASE_URL}/api/v1/trace/sdk',
+            payload=build_payload(),
+            headers={"athina-api-key": Trace.get_api_key(), "Content-Type": "application/json"},
+        )
@@ -1,5 +1,10 @@
-from datetime import datetime, timezone
-import json
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from ..serializer import default
+
+_JSON_PRIMITIVES = (str, int, float, bool)
 
 def remove_none_values(d):
     if isinstance(d, dict):
@@ -10,20 +15,53 @@ def remove_none_values(d):
         return d
 
 def sanitize_dict(d):
-    """Recursively sanitize dictionary to ensure JSON serializability."""
+    """Recursively sanitize dictionary to ensure JSON serializability.
+
+    Payloads no longer need this before they are sent, the serializer handles
+    non-serializable values with the same fallback as it encodes them."""
     if isinstance(d, dict):
         return {k: sanitize_dict(v) for k, v in d.items()}
-    elif isinstance(d, list):
+    elif isinstance(d, (list, tuple)):
         return [sanitize_dict(item) for item in d]
-    elif hasattr(d, '__dict__'):  # Custom object
-        return f"<{d.__class__.__name__} object>"
+    elif d is None or isinstance(d, (str, int, float, bool)):
+        return d
     else:
-        # Handle basic types that are JSON serializable
-        try:
-            json.dumps(d)
-            return d
-        except (TypeError, OverflowError):
-            return str(d)  # Convert to string as fallback
+        return default(d)
+
+def normalize(d):
+    """Prune None values and sanitize leaves in a single pass.
+
+    Returns the same result as sanitize_dict(remove_none_values(d)), but walks the
+    tree once and only copies the dicts and lists that actually change, so values
+    that are already json-safe are shared with the input rather than rebuilt."""
+    if d is None or isinstance(d, _JSON_PRIMITIVES):
+        return d
+    if isinstance(d, dict):
+        normalized = None
+        for index, (key, value) in enumerate(d.items()):
+            new_value = normalize(value) if value is not None else None
+            if normalized is None:
+                if new_value is value and value is not None:
+                    continue
+                # first change: copy the unchanged prefix and build a new dict from here on
+                normalized = dict(islice(d.items(), index))
+            if new_value is not None:
+                normalized[key] = new_value
+        return d if normalized is None else normalized
+    if isinstance(d, list):
+        normalized = None
+        for index, value in enumerate(d):
+            new_value = normalize(value) if value is not None else None
+            if normalized is None:
+                if new_value is value and value is not None:
+                    continue
+                normalized = d[:index]
+            if new_value is not None:
+                normalized.append(new_value)
+        return d if normalized is None else normalized
+    if isinstance(d, (tuple, set, frozenset)):
+        return [normalize(value) for value in d]
+    return default(d)
 
 def get_utc_time(time_obj=None):
     if time_obj is None:
@@ -31,3 +69,20 @@ def get_utc_time(time_obj=None):
     if time_obj.tzinfo is None:
         time_obj = time_obj.replace(tzinfo=timezone.utc)
     return time_obj.astimezone(timezone.utc)
+
+def to_iso(value):
+    """Formats a datetime as an ISO 8601 string, other values are returned as is."""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def end_timing(start_time, start_ns=None, end_time=None, end_ns=None):
+    """Returns the end time and the duration in milliseconds of something started at start_time.
+
+    When the start was recorded with time.perf_counter_ns() and the end either was too (end_ns)
+    or is now, the duration is measured with that monotonic clock, which does not jump when
+    the wall clock is adjusted, and the end time is derived from it. Otherwise both come from
+    the wall clock: end_time, captured together with end_ns, or now."""
+    if start_ns is not None and (end_ns is not None or end_time is None):
+        elapsed_ns = (end_ns if end_ns is not None else time.perf_counter_ns()) - start_ns
+        return get_utc_time(start_time) + timedelta(microseconds=elapsed_ns // 1000), elapsed_ns // 1_000_000
+    end_time = get_utc_time(end_time)
+    return end_time, int((end_time - get_utc_time(start_time)).total_seconds() * 1000)
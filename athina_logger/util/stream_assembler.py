@@ -0,0 +1,268 @@
+from typing import Any, Callable, Dict, List, Optional
+
+from .stream_metrics import StreamTimer
+
+
+class TextBuffer:
+    """
+    accumulates the text fragments of a stream. appending is O(1) and the fragments
+    are joined once when the text is read, instead of copying the text on every chunk.
+    """
+    __slots__ = ('_fragments',)
+
+    def __init__(self, text: str = ''):
+        self._fragments: List[str] = [text] if text else []
+
+    def append(self, text: Optional[str]):
+        if text:
+            self._fragments.append(text)
+
+    def getvalue(self) -> str:
+        fragments = self._fragments
+        if not fragments:
+            return ''
+        if len(fragments) > 1:
+            self._fragments = fragments = [''.join(fragments)]
+        return fragments[0]
+
+
+def _to_dict(obj: Any) -> Any:
+    if obj is None or isinstance(obj, dict):
+        return obj
+    return obj.model_dump()
+
+
+class _FunctionCallAssembler:
+    """
+    name and argument fragments of a streamed tool call or function call
+    """
+    __slots__ = ('id', 'type', 'name', 'arguments')
+
+    def __init__(self):
+        self.id = None
+        self.type = None
+        self.name = None
+        self.arguments = TextBuffer()
+
+    def add(self, delta: Any, function: Any, get: Callable):
+        call_id = get(delta, 'id', None)
+        if call_id:
+            self.id = call_id
+        call_type = get(delta, 'type', None)
+        if call_type:
+            self.type = call_type
+        if function is not None:
+            # the name comes whole with the first fragment, some compatible servers repeat it on every one
+            if self.name is None:
+                self.name = get(function, 'name', None)
+            self.arguments.append(get(function, 'arguments', None))
+
+    def function(self) -> Dict[str, str]:
+        return {'name': self.name or '', 'arguments': self.arguments.getvalue()}
+
+
+class _ChoiceAssembler:
+    """
+    merged deltas of one choice of a stream
+    """
+    __slots__ = ('index', 'role', 'content', 'refusal', 'function_call', 'tool_calls', 'finish_reason',
+                 'logprobs', 'is_chat')
+
+    def __init__(self, index: int):
+        self.index = index
+        self.role = None
+        self.content = TextBuffer()
+        self.refusal = TextBuffer()
+        self.function_call: Optional[_FunctionCallAssembler] = None
+        self.tool_calls: Dict[int, _FunctionCallAssembler] = {}
+        self.finish_reason = None
+        # token logprobs, appended as they stream in: lists per key
+        self.logprobs: Optional[Dict[str, List[Any]]] = None
+        self.is_chat = True
+
+    def add(self, choice: Any, get: Callable):
+        delta = get(choice, 'delta', None)
+        if delta is not None:
+            self._add_delta(delta, get)
+        else:
+            # text completion chunk
+            self.is_chat = False
+            self.content.append(get(choice, 'text', None))
+        finish_reason = get(choice, 'finish_reason', None)
+        if finish_reason:
+            self.finish_reason = finish_reason
+        logprobs = get(choice, 'logprobs', None)
+        if logprobs:
+            self._add_logprobs(logprobs)
+
+    def _add_delta(self, delta: Any, get: Callable):
+        role = get(delta, 'role', None)
+        if role:
+            self.role = role
+        self.content.append(get(delta, 'content', None))
+        self.refusal.append(get(delta, 'refusal', None))
+        function_call = get(delta, 'function_call', None)
+        if function_call is not None:
+            if self.function_call is None:
+                self.function_call = _FunctionCallAssembler()
+            self.function_call.add(function_call, function_call, get)
+        tool_calls = get(delta, 'tool_calls', None)
+        if tool_calls:
+            for tool_call in tool_calls:
+                # the fragments of a tool call share its index, the id and name only come with the first one
+                index = get(tool_call, 'index', None)
+                if index is None:
+                    index = len(self.tool_calls)
+                assembler = self.tool_calls.get(index)
+                if assembler is None:
+                    assembler = self.tool_calls[index] = _FunctionCallAssembler()
+                assembler.add(tool_call, get(tool_call, 'function', None), get)
+
+    def _add_logprobs(self, logprobs: Any):
+        if self.logprobs is None:
+            self.logprobs = {}
+        for key, values in _to_dict(logprobs).items():
+            if values:
+                self.logprobs.setdefault(key, []).extend(values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        if not self.is_chat:
+            return {
+                'index': self.index,
+                'text': self.content.getvalue(),
+                'finish_reason': self.finish_reason,
+                'logprobs': self.logprobs,
+            }
+        message = {
+            'role': self.role or 'assistant',
+            'content': self.content.getvalue() or None,
+        }
+        refusal = self.refusal.getvalue()
+        if refusal:
+            message['refusal'] = refusal
+        if self.function_call is not None:
+            message['function_call'] = self.function_call.function()
+        if self.tool_calls:
+            message['tool_calls'] = [
+                {'id': tool_call.id, 'type': tool_call.type or 'function', 'function': tool_call.function()}
+                for _, tool_call in sorted(self.tool_calls.items())
+            ]
+        return {
+            'index': self.index,
+            'message': message,
+            'finish_reason': self.finish_reason,
+            'logprobs': self.logprobs,
+        }
+
+
+class StreamAssembler:
+    """
+    rebuilds the completion of an openai chat completion or completion stream, chunk by chunk.
+
+    deltas are merged per choice index in a single pass: text, refusals and tool call
+    argument fragments go to fragment buffers that are joined once, so memory is bounded
+    by the size of the completion, not by the number of chunks. finish reasons, logprobs,
+    the system fingerprint and the usage reported in the last chunk are kept.
+    chunks can be typed openai objects or dicts.
+
+    the arrival of every chunk with choices is timed, see metrics(). started_at is the
+    time.perf_counter() value when the request was sent, and defaults to the creation of the assembler.
+    """
+
+    def __init__(self, started_at: Optional[float] = None):
+        self.timer = StreamTimer(started_at)
+        self.id = None
+        self.model = None
+        self.created = None
+        self.system_fingerprint = None
+        self.service_tier = None
+        # token usage reported by openai in the last chunk, with stream_options={'include_usage': True}
+        self.usage: Optional[Dict[str, Any]] = None
+        self._choices: Dict[int, _ChoiceAssembler] = {}
+
+    def add(self, stream_chunk: Any):
+        """
+        merges a stream chunk into the completion
+        """
+        # stream chunks are typed objects with openai >= 1, and dicts with older versions or raw SSE events.
+        # both are read with a builtin, dict.get(chunk, name, None) or getattr(chunk, name, None)
+        get = dict.get if isinstance(stream_chunk, dict) else getattr
+        if self.id is None:
+            self.id = get(stream_chunk, 'id', None)
+            self.model = get(stream_chunk, 'model', None)
+            self.created = get(stream_chunk, 'created', None)
+        # the same for every chunk of a stream, but not necessarily sent with the first one
+        if self.system_fingerprint is None:
+            self.system_fingerprint = get(stream_chunk, 'system_fingerprint', None)
+        if self.service_tier is None:
+            self.service_tier = get(stream_chunk, 'service_tier', None)
+        usage = get(stream_chunk, 'usage', None)
+        if usage:
+            self.usage = _to_dict(usage)
+        choices = get(stream_chunk, 'choices', None)
+        if choices:
+            self.timer.tick()
+            for choice in choices:
+                index = get(choice, 'index', None) or 0
+                assembler = self._choices.get(index)
+                if assembler is None:
+                    assembler = self._choices[index] = _ChoiceAssembler(index)
+                assembler.add(choice, get)
+
+    @property
+    def text(self) -> str:
+        """
+        the text of the first choice
+        """
+        choice = self._choices.get(0)
+        return choice.content.getvalue() if choice is not None else ''
+
+    @text.setter
+    def text(self, text: str):
+        # replaces the text of the first choice, later chunks are appended to it
+        choice = self._choices.get(0)
+        if choice is None:
+            choice = self._choices[0] = _ChoiceAssembler(0)
+        choice.content = TextBuffer(text or '')
+
+    @property
+    def finish_reason(self) -> Optional[str]:
+        """
+        the finish reason of the first choice
+        """
+        choice = self._choices.get(0)
+        return choice.finish_reason if choice is not None else None
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        the latency metrics of the stream in milliseconds, see StreamTimer.metrics
+        """
+        return self.timer.metrics()
+
+    def message(self) -> Optional[Dict[str, Any]]:
+        """
+        the assembled message of the first choice of a chat completion stream
+        """
+        choice = self._choices.get(0)
+        if choice is None or not choice.is_chat:
+            return None
+        return choice.to_dict()['message']
+
+    def completion(self) -> Dict[str, Any]:
+        """
+        the assembled completion, shaped like the response of the same request without streaming
+        """
+        choices = [choice.to_dict() for _, choice in sorted(self._choices.items())]
+        is_chat = all(choice.is_chat for choice in self._choices.values())
+        completion = {
+            'id': self.id,
+            'object': 'chat.completion' if is_chat else 'text_completion',
+            'created': self.created,
+            'model': self.model,
+            'choices': choices,
+            'system_fingerprint': self.system_fingerprint,
+            'usage': self.usage,
+        }
+        if self.service_tier is not None:
+            completion['service_tier'] = self.service_tier
+        return completion
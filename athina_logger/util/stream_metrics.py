@@ -0,0 +1,78 @@
+import time
+from array import array
+from typing import Any, Dict, Optional
+
+
+class StreamTimer:
+    """
+    measures the latency of a streamed completion: the time to the first chunk, the total
+    duration of the stream and the latency between consecutive chunks.
+    each chunk costs one clock read and one append to a compact array of floats.
+    """
+    __slots__ = ('started_at', 'first_chunk_at', 'last_chunk_at', '_gaps')
+
+    def __init__(self, started_at: Optional[float] = None):
+        # time.perf_counter() when the request was sent, defaults to now
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.first_chunk_at: Optional[float] = None
+        self.last_chunk_at: Optional[float] = None
+        self._gaps = array('d')
+
+    def tick(self):
+        """
+        records the arrival of a chunk
+        """
+        now = time.perf_counter()
+        if self.first_chunk_at is None:
+            self.first_chunk_at = now
+        else:
+            self._gaps.append(now - self.last_chunk_at)
+        self.last_chunk_at = now
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        the latency metrics of the stream, in milliseconds: time_to_first_token, stream_duration
+        and the inter_chunk_latency percentiles. empty if no chunk arrived.
+        """
+        if self.first_chunk_at is None:
+            return {}
+        metrics = {
+            'time_to_first_token': _ms(self.first_chunk_at - self.started_at),
+            'stream_duration': _ms(self.last_chunk_at - self.started_at),
+        }
+        if self._gaps:
+            gaps = sorted(self._gaps)
+            metrics['inter_chunk_latency'] = {
+                'p50': _ms(_percentile(gaps, 50)),
+                'p90': _ms(_percentile(gaps, 90)),
+                'p99': _ms(_percentile(gaps, 99)),
+                'max': _ms(gaps[-1]),
+            }
+        return metrics
+
+
+def tokens_per_second(completion_tokens: Optional[int], time_to_first_token: Optional[float],
+                      stream_duration: Optional[float]) -> Optional[float]:
+    """
+    the generation throughput of a stream: the completion tokens after the first one per second
+    after the first token, or all of them over the whole stream when they arrived in a single chunk
+    """
+    if completion_tokens is None or time_to_first_token is None or stream_duration is None:
+        return None
+    generation_ms = stream_duration - time_to_first_token
+    if completion_tokens > 1 and generation_ms > 0:
+        # the first token arrived with the first chunk, its time is time_to_first_token
+        return round((completion_tokens - 1) * 1000 / generation_ms, 2)
+    if stream_duration <= 0:
+        return None
+    return round(completion_tokens * 1000 / stream_duration, 2)
+
+
+def _percentile(sorted_values, percent: int) -> float:
+    # nearest rank
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[index]
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
@@ -1,9 +1,122 @@
-from typing import Dict, List, Any
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
 import tiktoken
-from ..constants import OPENAI_MODEL_ENCODINGS
+from ..constants import (
+    TOKEN_COUNT_CACHE_SIZE,
+    OPENAI_MODEL_ENCODINGS,
+    OPENAI_MODEL_FAMILY_ENCODINGS,
+    OPENAI_REASONING_MODEL_PREFIXES,
+    TOKEN_COUNT_BATCH_MIN_CHARS,
+    TOKEN_COUNT_THREADS,
+)
 
 # source: https://github.com/openai/openai-cookbook/blob/main/examples/How_to_count_tokens_with_tiktoken.ipynb
 
+# message overhead of the chat models, the same for all supported model families
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_NAME = 1
+
+
+def get_encoding_name(language_model_id: str) -> Optional[str]:
+    """
+    resolves the tiktoken encoding name of an openai model, or None if the model is not known
+    """
+    encoding_name = OPENAI_MODEL_ENCODINGS.get(language_model_id)
+    if encoding_name is not None:
+        return encoding_name
+    for family, encoding_name in OPENAI_MODEL_FAMILY_ENCODINGS:
+        if family in language_model_id:
+            return encoding_name
+    if language_model_id.startswith(OPENAI_REASONING_MODEL_PREFIXES):
+        return 'o200k_base'
+    return None
+
+
+@lru_cache(maxsize=256)
+def get_encoding(language_model_id: str) -> Optional[tiktoken.Encoding]:
+    """
+    returns the tiktoken encoding of an openai model, or None if the model is not known.
+    cached per model id, so resolving the model and loading the encoding happen once per process.
+    """
+    encoding_name = get_encoding_name(language_model_id)
+    if encoding_name is None:
+        return None
+    return tiktoken.get_encoding(encoding_name)
+
+
+class MessageTokenCache:
+    """
+    bounded, thread-safe lru cache of the token count of chat messages, keyed on the
+    encoding name and a digest of the message. a chat session re-sends its whole history
+    every turn, so only the new messages of a turn have to be tokenized.
+    """
+
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._counts: 'OrderedDict[Tuple[str, bytes], int]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[int]:
+        with self._lock:
+            count = self._counts.get(key)
+            if count is None:
+                self.misses += 1
+                return None
+            self._counts.move_to_end(key)
+            self.hits += 1
+            return count
+
+    def put(self, key: Tuple[str, bytes], count: int):
+        if self._maxsize <= 0:
+            return
+        with self._lock:
+            self._counts[key] = count
+            self._counts.move_to_end(key)
+            while len(self._counts) > self._maxsize:
+                self._counts.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._counts)
+
+
+message_token_cache = MessageTokenCache(TOKEN_COUNT_CACHE_SIZE)
+
+
+def _message_digest(message: Dict[str, Any]) -> bytes:
+    """
+    digest of the keys and values of a chat message. the cache keeps the digest
+    rather than the message, so cached long messages are not held in memory.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for key, value in message.items():
+        digest.update(key.encode('utf-8'))
+        digest.update(b'\x00')
+        digest.update(value.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.digest()
+
+
+def count_tokens_per_text(encoding: tiktoken.Encoding, texts: List[str]) -> List[int]:
+    """
+    counts the tokens of each of the texts. large inputs are encoded in one batched call,
+    which tiktoken spreads over threads that release the GIL. small ones are encoded
+    directly, since starting the threads would cost more than it saves.
+    """
+    if len(texts) > 1 and sum(map(len, texts)) >= TOKEN_COUNT_BATCH_MIN_CHARS:
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts, num_threads=TOKEN_COUNT_THREADS)]
+    return [len(encoding.encode_ordinary(text)) for text in texts]
+
 
 def get_prompt_tokens_openai_chat_completion(prompt: List[Dict[str, Any]], language_model_id: str):
     """
@@ -12,39 +125,37 @@ def get_prompt_tokens_openai_chat_completion(prompt: List[Dict[str, Any]], langu
     if prompt is None:
         raise ValueError('prompt is None')
 
-    if language_model_id in {
-        'gpt-3.5-turbo-0613',
-        'gpt-3.5-turbo-16k-0613',
-        'gpt-4-0613',
-        'gpt-4-32k-0613',
-    }:
-        tokens_per_message = 3
-        tokens_per_name = 1
-    elif 'gpt-3.5-turbo' in language_model_id:
-        return get_prompt_tokens_openai_chat_completion(prompt=prompt, language_model_id='gpt-3.5-turbo-0613')
-    elif 'gpt-4' in language_model_id:
-        return get_prompt_tokens_openai_chat_completion(prompt=prompt, language_model_id='gpt-4-0613')
-    else:
+    encoding = get_encoding(language_model_id)
+    if encoding is None:
         raise ValueError(
             f'Language model {language_model_id} is not supported')
 
-    try:
-        encoding = tiktoken.get_encoding(OPENAI_MODEL_ENCODINGS[language_model_id])
-    except KeyError:
-        return None
+    # messages seen in an earlier turn are looked up, only the new ones are tokenized
+    num_tokens = 3
+    texts = []
+    # (cache key, token overhead of the message, number of values) of every uncached message
+    uncached = []
+    for message in prompt:
+        key = (encoding.name, _message_digest(message))
+        cached = message_token_cache.get(key)
+        if cached is not None:
+            num_tokens += cached
+            continue
+        overhead = TOKENS_PER_MESSAGE
+        for name, value in message.items():
+            texts.append(value)
+            if name == 'name':
+                overhead += TOKENS_PER_NAME
+        uncached.append((key, overhead, len(message)))
 
-    try:
-        num_tokens = 0
-        for message in prompt:
-            num_tokens += tokens_per_message
-            for key, value in message.items():
-                num_tokens += len(encoding.encode(value))
-                if key == 'name':
-                    num_tokens += tokens_per_name
-        num_tokens += 3
-        return num_tokens
-    except Exception as e:
-        raise e
+    counts = count_tokens_per_text(encoding, texts)
+    start = 0
+    for key, overhead, num_values in uncached:
+        message_tokens = overhead + sum(counts[start:start + num_values])
+        start += num_values
+        message_token_cache.put(key, message_tokens)
+        num_tokens += message_tokens
+    return num_tokens
 
 
 def get_completion_tokens_openai_chat_completion(response: str, language_model_id: str):
@@ -53,29 +164,12 @@ def get_completion_tokens_openai_chat_completion(response: str, language_model_i
     """
     if response is None:
         raise ValueError('response is None')
-    try:
-        if language_model_id in {
-            'gpt-3.5-turbo-0613',
-            'gpt-3.5-turbo-16k-0613',
-            'gpt-4-0613',
-            'gpt-4-32k-0613',
-        }:
-            encoding = tiktoken.get_encoding(OPENAI_MODEL_ENCODINGS[language_model_id])
-        elif 'gpt-3.5-turbo' in language_model_id:
-            return get_completion_tokens_openai_chat_completion(response=response, language_model_id='gpt-3.5-turbo-0613')
-        elif 'gpt-4' in language_model_id:
-            return get_completion_tokens_openai_chat_completion(response=response, language_model_id='gpt-4-0613')
-        else:
-            raise ValueError(
-                f'Language model {language_model_id} is not supported')
-    except KeyError:
-        return None
 
-    try:
-        tokens = len(encoding.encode(response))
-        return tokens
-    except Exception as e:
-        raise e
+    encoding = get_encoding(language_model_id)
+    if encoding is None:
+        raise ValueError(
+            f'Language model {language_model_id} is not supported')
+    return len(encoding.encode_ordinary(response))
 
 
 def get_token_usage_openai_completion(text: str, language_model_id: str):
@@ -84,13 +178,54 @@ def get_token_usage_openai_completion(text: str, language_model_id: str):
     """
     if text is None:
         raise ValueError('text is None')
-    try:
-        encoding = tiktoken.get_encoding(OPENAI_MODEL_ENCODINGS[language_model_id])
-    except KeyError:
+
+    encoding = get_encoding(language_model_id)
+    if encoding is None:
         return None
+    return len(encoding.encode_ordinary(text))
 
+
+def count_chat_completion_token_usage(prompt: List[Dict[str, Any]], response: str,
+                                      language_model_id: str) -> Dict[str, Optional[int]]:
+    """
+    counts the prompt, completion and total tokens of an openai chat completion.
+    counts that cannot be computed, e.g. for unknown models, are None
+    """
+    try:
+        prompt_tokens = get_prompt_tokens_openai_chat_completion(prompt=prompt, language_model_id=language_model_id)
+    except Exception:
+        prompt_tokens = None
     try:
-        tokens = len(encoding.encode(text))
-        return tokens
-    except Exception as e:
-        raise e
+        completion_tokens = get_completion_tokens_openai_chat_completion(
+            response=response, language_model_id=language_model_id)
+    except Exception:
+        completion_tokens = None
+    return _token_usage(prompt_tokens, completion_tokens)
+
+
+def count_completion_token_usage(prompt: str, response: str, language_model_id: str) -> Dict[str, Optional[int]]:
+    """
+    counts the prompt, completion and total tokens of an openai completion.
+    counts that cannot be computed, e.g. for unknown models, are None
+    """
+    try:
+        prompt_tokens = get_token_usage_openai_completion(text=prompt, language_model_id=language_model_id)
+    except Exception:
+        prompt_tokens = None
+    try:
+        completion_tokens = get_token_usage_openai_completion(text=response, language_model_id=language_model_id)
+    except Exception:
+        completion_tokens = None
+    return _token_usage(prompt_tokens, completion_tokens)
+
+
+def _token_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> Dict[str, Optional[int]]:
+    if prompt_tokens is not None and completion_tokens is not None:
+        total_tokens = prompt_tokens + completion_tokens
+    else:
+        total_tokens = None
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': total_tokens,
+    }
@@ -0,0 +1,50 @@
+"""
+measures the memory allocated per span when building a wide trace, for plain spans
+and for generations, as created by high fan-out langchain agents.
+
+run from the repository root with: python -m benchmarks.span_allocations
+"""
+import gc
+import time
+import tracemalloc
+
+from athina_logger.tracing.trace import Trace
+
+NUM_SPANS = 10000
+
+
+def create_spans(trace: Trace):
+    for i in range(NUM_SPANS):
+        trace.create_span(name='tool')
+
+
+def create_generations(trace: Trace):
+    for i in range(NUM_SPANS):
+        generation = trace.create_generation(name='llm', prompt='hello', language_model_id='gpt-4o')
+        generation.update(response='world', prompt_tokens=1, completion_tokens=1)
+
+
+def measure(name, create):
+    trace = Trace(name='benchmark')
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    started = time.perf_counter()
+    create(trace)
+    elapsed = time.perf_counter() - started
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    size = sum(stat.size_diff for stat in stats)
+    blocks = sum(stat.count_diff for stat in stats)
+    print(f'{name:12s} {size / NUM_SPANS:8.0f} bytes  {blocks / NUM_SPANS:6.1f} blocks  '
+          f'{elapsed / NUM_SPANS * 1000000:6.1f} us per span (traced)')
+
+
+def main():
+    measure('span', create_spans)
+    measure('generation', create_generations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+compares the cost of collecting a synthetic 10k chunk chat completion stream: the previous
+path (model_dump of every chunk and string concatenation) against the stream assembler, which
+reads the typed chunks through their attributes into fragment buffers joined once at the end.
+
+run from the repository root with: python -m benchmarks.stream_accumulation
+"""
+import timeit
+
+from openai.types.chat import ChatCompletionChunk
+
+from athina_logger.util.stream_assembler import StreamAssembler
+
+NUM_CHUNKS = 10000
+
+
+def build_stream():
+    return [
+        ChatCompletionChunk.model_validate({
+            'id': 'chatcmpl-1', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'gpt-4o',
+            'system_fingerprint': 'fp_1',
+            'choices': [{'index': 0, 'delta': {'content': f'token{i} '}, 'finish_reason': None, 'logprobs': None}],
+        })
+        for i in range(NUM_CHUNKS)
+    ]
+
+
+def dump_and_concatenate(stream):
+    response = ''
+    for chunk in stream:
+        choices = chunk.model_dump().get('choices', [])
+        if choices and 'delta' in choices[0]:
+            delta = choices[0].get('delta', {})
+            if delta.get('content') is not None:
+                response += delta['content']
+    return response
+
+
+def stream_assembler(stream):
+    assembler = StreamAssembler()
+    for chunk in stream:
+        assembler.add(chunk)
+    return assembler.completion()['choices'][0]['message']['content']
+
+
+def main():
+    stream = build_stream()
+    assert dump_and_concatenate(stream) == stream_assembler(stream)
+    results = {}
+    for name, collect in (('model_dump + string concatenation', dump_and_concatenate),
+                          ('stream assembler', stream_assembler)):
+        runs = 5
+        results[name] = min(timeit.repeat(lambda: collect(stream), number=runs, repeat=3)) / runs
+        print(f'{name:40s} {results[name] * 1000:8.2f} ms per stream ({NUM_CHUNKS} chunks)')
+    before, after = results.values()
+    print(f'{"speedup":40s} {before / after:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
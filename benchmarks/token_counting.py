@@ -0,0 +1,62 @@
+"""
+measures the time to count the prompt tokens of chat prompts of increasing size, encoding
+the messages one by one and in one batched call. used to pick TOKEN_COUNT_BATCH_MIN_CHARS.
+
+uses the real o200k_base encoding when it can be loaded, and a byte-level stand-in otherwise.
+
+run from the repository root with: python -m benchmarks.token_counting
+"""
+import time
+
+import tiktoken
+
+from athina_logger.constants import TOKEN_COUNT_THREADS
+
+# (number of messages, characters per message)
+PROMPT_SIZES = [(2, 200), (10, 1000), (20, 4000), (50, 8000), (100, 20000)]
+WORDS = 'the quick brown fox jumps over the lazy dog while tokens are counted '
+
+
+def load_encoding() -> tiktoken.Encoding:
+    try:
+        return tiktoken.get_encoding('o200k_base')
+    except Exception as e:
+        print(f'o200k_base is not available ({e}), using a byte-level encoding')
+        return tiktoken.Encoding(
+            'bytes', pat_str=r"[^\s]+|\s+", mergeable_ranks={bytes([i]): i for i in range(256)}, special_tokens={})
+
+
+def build_texts(num_messages: int, message_chars: int):
+    text = (WORDS * (message_chars // len(WORDS) + 1))[:message_chars]
+    return [f'{i} {text}' for i in range(num_messages)]
+
+
+def sequential(encoding, texts):
+    return sum(len(encoding.encode_ordinary(text)) for text in texts)
+
+
+def batched(encoding, texts):
+    return sum(len(tokens) for tokens in encoding.encode_ordinary_batch(texts, num_threads=TOKEN_COUNT_THREADS))
+
+
+def measure(count, encoding, texts):
+    repeat = max(1, 2000000 // sum(map(len, texts)))
+    started = time.perf_counter()
+    for _ in range(repeat):
+        count(encoding, texts)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    encoding = load_encoding()
+    for num_messages, message_chars in PROMPT_SIZES:
+        texts = build_texts(num_messages, message_chars)
+        assert sequential(encoding, texts) == batched(encoding, texts)
+        one_by_one = measure(sequential, encoding, texts)
+        batch = measure(batched, encoding, texts)
+        print(f'{num_messages:4d} messages x {message_chars:6d} chars  sequential {one_by_one * 1000:8.3f} ms  '
+              f'batched {batch * 1000:8.3f} ms  speedup {one_by_one / batch:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+compares the cost of turning a large trace into its export payload: the previous
+three-pass path (to_dict, remove_none_values, sanitize_dict) against the single-pass normalizer,
+and shows the part of Trace.end that still runs on the caller's thread (freezing the trace).
+
+run from the repository root with: python -m benchmarks.trace_export
+"""
+import timeit
+
+from athina_logger.tracing.trace import Trace
+from athina_logger.tracing.util import remove_none_values, sanitize_dict
+
+NUM_STEPS = 50
+SPANS_PER_STEP = 10
+DOCUMENT = 'lorem ipsum dolor sit amet ' * 40
+
+
+def build_trace() -> Trace:
+    trace = Trace(name='agent', input={'question': 'what happened?'})
+    for i in range(NUM_STEPS):
+        step = trace.create_span(name=f'step {i}', attributes={'iteration': i, 'tool': None})
+        for j in range(SPANS_PER_STEP):
+            step.create_span(
+                name=f'retrieval {j}',
+                input={'query': f'query {j}', 'filters': None},
+                output={'documents': [{'text': DOCUMENT, 'score': 0.5, 'metadata': {'source': None}} for _ in range(5)]},
+            )
+        step.create_generation(
+            name='llm', prompt=[{'role': 'user', 'content': DOCUMENT}], response=DOCUMENT, prompt_tokens=100)
+    return trace
+
+
+def three_pass(trace: Trace):
+    return sanitize_dict(remove_none_values(trace.to_dict()))
+
+
+def single_pass(trace: Trace):
+    return trace._export_dict()
+
+
+def main():
+    trace = build_trace()
+    assert three_pass(trace) == single_pass(trace)
+    spans = NUM_STEPS * (SPANS_PER_STEP + 2)
+    for name, export in (('to_dict + remove_none_values + sanitize_dict', three_pass), ('single pass normalize', single_pass)):
+        runs = 20
+        seconds = min(timeit.repeat(lambda: export(trace), number=runs, repeat=3)) / runs
+        print(f'{name:48s} {seconds * 1000:8.2f} ms per trace ({spans} spans)')
+    runs = 10000
+    seconds = min(timeit.repeat(lambda: trace._freeze(), number=runs, repeat=3)) / runs
+    print(f'{"Trace.end on the caller thread (freeze)":48s} {seconds * 1000000:8.2f} us per trace ({spans} spans)')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,229 @@
+import gzip
+import json
 import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import tiktoken
 from dotenv import load_dotenv
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # load the .env file before any test or sdk initialization
 load_dotenv()
 
 # (optional) print to confirm env vars are loaded
 print("loaded environment variable ATHINA_API_KEY:", os.getenv("ATHINA_API_KEY"))
 print("loaded environment variable API_BASE_URL:", os.getenv("API_BASE_URL"))
+
+
+class MockAthinaServer:
+    """
+    local stand-in for the athina api that records every request it receives.
+    compressed bodies are decoded according to their Content-Encoding.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.status_code = 200
+        # (status code, headers) to answer the next requests with, before falling back to status_code
+        self.responses = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # buffer the response and send it in one write, or nagle's algorithm and delayed acks
+            # hold every keep-alive response back for tens of milliseconds
+            wbufsize = -1
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                body_size = len(body)
+                content_encoding = self.headers.get('Content-Encoding')
+                if content_encoding == 'gzip':
+                    body = gzip.decompress(body)
+                elif content_encoding == 'zstd':
+                    body = zstandard.ZstdDecompressor().decompress(body)
+                with server._lock:
+                    server.requests.append({
+                        'method': self.command,
+                        'path': self.path,
+                        'headers': dict(self.headers),
+                        'client_address': self.client_address,
+                        'body_size': body_size,
+                        'json': json.loads(body) if body else None,
+                    })
+                status_code, headers = server._next_response()
+                if status_code < 300:
+                    response = json.dumps({'status': 'success'}).encode('utf-8')
+                else:
+                    response = json.dumps({'error': 'Mock Error', 'details': {'message': str(status_code)}}).encode('utf-8')
+                self.send_response(status_code)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            do_POST = _handle
+            do_PATCH = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address
+        return f'http://{host}:{port}'
+
+    def _next_response(self):
+        with self._lock:
+            if self.responses:
+                return self.responses.pop(0)
+        return self.status_code, {}
+
+    def requests_to(self, path):
+        with self._lock:
+            return [request for request in self.requests if request['path'] == path]
+
+    def wait_for(self, predicate, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.01)
+        return predicate()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class FakeOpenAiServer:
+    """
+    local stand-in for the openai chat completions api. answers every request with the content
+    of its last message, reversed word by word, streamed one word per chunk when stream is set.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # buffer the response and send it in one write, or nagle's algorithm and delayed acks
+            # hold every keep-alive response back for tens of milliseconds
+            wbufsize = -1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+                with server._lock:
+                    server.requests += 1
+                words = body['messages'][-1]['content'].split()[::-1]
+                completion = {'id': 'chatcmpl-fake', 'created': 0, 'model': body['model']}
+                if body.get('stream'):
+                    events = [
+                        {**completion, 'object': 'chat.completion.chunk',
+                         'choices': [{'index': 0, 'delta': {'content': word if i == 0 else f' {word}'}, 'finish_reason': None}]}
+                        for i, word in enumerate(words)
+                    ]
+                    events.append({**completion, 'object': 'chat.completion.chunk',
+                                   'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+                    if (body.get('stream_options') or {}).get('include_usage'):
+                        events.append({**completion, 'object': 'chat.completion.chunk', 'choices': [], 'usage': {
+                            'prompt_tokens': 1, 'completion_tokens': len(words), 'total_tokens': 1 + len(words)}})
+                    response = b''.join(b'data: ' + json.dumps(event).encode('utf-8') + b'\n\n' for event in events)
+                    response += b'data: [DONE]\n\n'
+                    content_type = 'text/event-stream'
+                else:
+                    response = json.dumps({**completion, 'object': 'chat.completion', 'choices': [{
+                        'index': 0, 'message': {'role': 'assistant', 'content': ' '.join(words)}, 'finish_reason': 'stop',
+                    }]}).encode('utf-8')
+                    content_type = 'application/json'
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            # many clients may connect at once
+            request_queue_size = 512
+            daemon_threads = True
+
+        self._httpd = Server(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def athina_server():
+    server = MockAthinaServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def openai_server():
+    server = FakeOpenAiServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def byte_encodings(monkeypatch):
+    """
+    replaces the tiktoken encodings, which are downloaded on first use, by byte-level
+    encodings that work offline: every byte of the utf-8 encoded text is one token.
+    returns the names of the encodings that were loaded.
+    """
+    from athina_logger.util import token_count_helper
+
+    loaded = []
+
+    def get_encoding(name):
+        loaded.append(name)
+        return tiktoken.Encoding(
+            name=name,
+            pat_str=r"""[^\s]+|\s+""",
+            mergeable_ranks={bytes([i]): i for i in range(256)},
+            special_tokens={},
+        )
+
+    monkeypatch.setattr(tiktoken, 'get_encoding', get_encoding)
+    token_count_helper.get_encoding.cache_clear()
+    token_count_helper.message_token_cache.clear()
+    yield loaded
+    token_count_helper.get_encoding.cache_clear()
+    token_count_helper.message_token_cache.clear()
@@ -0,0 +1,79 @@
+import asyncio
+
+import athina_logger
+from athina_logger import async_inference_logger
+from athina_logger.async_inference_logger import AsyncInferenceLogger
+from athina_logger.async_request_helper import AsyncRequestHelper
+from athina_logger.exporter import BackgroundExporter
+from athina_logger.tracing import trace as trace_module
+from athina_logger.tracing.trace import Trace
+
+
+def test_log_inference_schedules_sends_on_running_loop(athina_server, monkeypatch):
+    monkeypatch.setattr(async_inference_logger, 'API_BASE_URL', athina_server.url)
+
+    async def main():
+        for i in range(5):
+            await AsyncInferenceLogger.log_inference(prompt=f'prompt {i}', response='ok', prompt_slug='async')
+            assert await AsyncInferenceLogger.flush(timeout=5)
+        await AsyncRequestHelper.aclose()
+
+    asyncio.run(main())
+
+    requests = athina_server.requests_to('/api/v1/log/inference')
+    assert sorted(request['json']['prompt'] for request in requests) == [f'prompt {i}' for i in range(5)]
+    assert len({request['client_address'][1] for request in requests}) == 1
+
+
+def test_trace_end_async(athina_server, monkeypatch):
+    monkeypatch.setattr(trace_module, 'API_BASE_URL', athina_server.url)
+
+    async def main():
+        trace = Trace(name='async trace')
+        trace.create_span(name='step').end()
+        await trace.end_async()
+        assert await AsyncInferenceLogger.flush(timeout=5)
+        await AsyncRequestHelper.aclose()
+
+    asyncio.run(main())
+
+    requests = athina_server.requests_to('/api/v1/trace/sdk')
+    assert len(requests) == 1
+    assert requests[0]['json']['name'] == 'async trace'
+    assert requests[0]['json']['spans'][0]['name'] == 'step'
+
+
+def test_aflush_waits_for_async_sends(athina_server, monkeypatch):
+    monkeypatch.setattr(async_inference_logger, 'API_BASE_URL', athina_server.url)
+
+    BackgroundExporter.configure()
+
+    async def main():
+        for i in range(3):
+            await AsyncInferenceLogger.log_inference(prompt=f'prompt {i}', response='ok', prompt_slug='async')
+        assert BackgroundExporter.get_instance().async_pending == 3
+        assert await athina_logger.aflush(timeout=5)
+        assert BackgroundExporter.get_instance().async_pending == 0
+        await AsyncRequestHelper.aclose()
+
+    asyncio.run(main())
+
+    assert len(athina_server.requests_to('/api/v1/log/inference')) == 3
+
+
+def test_flush_warns_about_pending_async_sends(athina_server, monkeypatch, capsys):
+    monkeypatch.setattr(async_inference_logger, 'API_BASE_URL', athina_server.url)
+    exporter = BackgroundExporter.configure()
+
+    async def main():
+        await AsyncInferenceLogger.log_inference(prompt='prompt', response='ok', prompt_slug='async')
+        athina_logger.flush(timeout=1)
+
+    # the send is still pending when asyncio.run() closes the loop
+    asyncio.run(main())
+
+    output = capsys.readouterr().out
+    assert 'does not wait for 1 logs pending on event loops' in output
+    assert 'event loop was closed before it was sent' in output
+    assert exporter.stats()['dropped_shutdown'] == 1
+    assert exporter.async_pending == 0
@@ -0,0 +1,103 @@
+import asyncio
+import gzip
+
+import pytest
+
+from athina_logger import async_inference_logger, inference_logger
+from athina_logger.async_inference_logger import AsyncInferenceLogger
+from athina_logger.compression import BodyCompressor, zstandard
+from athina_logger.exporter import BackgroundExporter
+from athina_logger.inference_logger import InferenceLogger
+from athina_logger.request_helper import RequestHelper
+from athina_logger.tracing import trace as trace_module
+from athina_logger.tracing.trace import Trace
+
+LARGE_CONTEXT = {'documents': [f'retrieved document {i} ' * 50 for i in range(20)]}
+
+
+@pytest.fixture
+def compression(monkeypatch):
+    def configure(encoding, threshold=1024):
+        monkeypatch.setattr(RequestHelper, '_compressor', BodyCompressor(encoding, threshold))
+    return configure
+
+
+@pytest.fixture
+def exporter(athina_server, monkeypatch):
+    monkeypatch.setattr(inference_logger, 'API_BASE_URL', athina_server.url)
+    monkeypatch.setattr(trace_module, 'API_BASE_URL', athina_server.url)
+    exporter = BackgroundExporter.configure(num_workers=1)
+    yield exporter
+    BackgroundExporter.configure()
+
+
+@pytest.mark.parametrize('encoding', [
+    'gzip',
+    pytest.param('zstd', marks=pytest.mark.skipif(zstandard is None, reason='zstandard is not installed')),
+])
+def test_large_inferences_are_compressed(encoding, compression, exporter, athina_server):
+    compression(encoding)
+    InferenceLogger.log_inference(prompt='summarize', response='summary', context=LARGE_CONTEXT)
+
+    assert exporter.flush(timeout=5)
+    request, = athina_server.requests_to('/api/v1/log/inference')
+    assert request['headers']['Content-Encoding'] == encoding
+    assert request['json']['context'] == LARGE_CONTEXT
+    assert request['body_size'] < len(str(LARGE_CONTEXT)) / 10
+
+
+def test_small_payloads_are_sent_uncompressed(compression, exporter, athina_server):
+    compression('gzip', threshold=1024)
+    InferenceLogger.log_inference(prompt='hi', response='hello')
+
+    assert exporter.flush(timeout=5)
+    request, = athina_server.requests_to('/api/v1/log/inference')
+    assert 'Content-Encoding' not in request['headers']
+    assert request['json']['prompt'] == 'hi'
+
+
+def test_batches_and_traces_are_compressed(compression, athina_server, monkeypatch):
+    compression('gzip', threshold=256)
+    monkeypatch.setattr(inference_logger, 'API_BASE_URL', athina_server.url)
+    monkeypatch.setattr(trace_module, 'API_BASE_URL', athina_server.url)
+    exporter = BackgroundExporter.configure(num_workers=1, batching=True, max_batch_size=5, max_linger_ms=50)
+    try:
+        for i in range(5):
+            InferenceLogger.log_inference(prompt=f'prompt {i}', response='ok', context=LARGE_CONTEXT)
+        trace = Trace(name='compressed trace')
+        trace.create_span(name='retrieval', input={'query': 'q'}, output=LARGE_CONTEXT).end()
+        trace.end()
+
+        assert exporter.flush(timeout=5)
+        batches = athina_server.requests_to('/api/v1/log/inference/batch')
+        assert all(batch['headers']['Content-Encoding'] == 'gzip' for batch in batches)
+        assert [item['prompt'] for batch in batches for item in batch['json']] == [f'prompt {i}' for i in range(5)]
+        uploaded, = athina_server.requests_to('/api/v1/trace/sdk')
+        assert uploaded['headers']['Content-Encoding'] == 'gzip'
+        assert uploaded['json']['name'] == 'compressed trace'
+    finally:
+        BackgroundExporter.configure()
+
+
+def test_async_inferences_are_compressed(compression, athina_server, monkeypatch):
+    compression('gzip')
+    monkeypatch.setattr(async_inference_logger, 'API_BASE_URL', athina_server.url)
+
+    async def main():
+        await AsyncInferenceLogger.log_inference(prompt='summarize', response='summary', context=LARGE_CONTEXT)
+        assert await AsyncInferenceLogger.flush(timeout=5)
+
+    asyncio.run(main())
+    request, = athina_server.requests_to('/api/v1/log/inference')
+    assert request['headers']['Content-Encoding'] == 'gzip'
+    assert request['json']['context'] == LARGE_CONTEXT
+
+
+def test_compressor_skips_bodies_below_the_threshold():
+    compressor = BodyCompressor('gzip', threshold=100)
+
+    assert compressor.compress(b'x' * 99) == (b'x' * 99, None)
+    body, encoding = compressor.compress(b'x' * 100)
+    assert encoding == 'gzip' and gzip.decompress(body) == b'x' * 100
+    with pytest.raises(ValueError):
+        BodyCompressor('brotli')
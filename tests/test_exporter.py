@@ -0,0 +1,245 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from athina_logger import inference_logger
+from athina_logger.exporter import BackgroundExporter, ExportRecord
+from athina_logger.inference_logger import InferenceLogger
+from athina_logger.request_helper import RequestHelper
+
+
+@pytest.fixture
+def exporter():
+    exporter = BackgroundExporter.configure(max_queue_size=4, num_workers=1)
+    yield exporter
+    BackgroundExporter.configure()
+
+
+@pytest.fixture
+def batching_exporter(athina_server, monkeypatch):
+    monkeypatch.setattr(inference_logger, 'API_BASE_URL', athina_server.url)
+    exporter = BackgroundExporter.configure(
+        num_workers=2, batching=True, max_batch_size=10, max_batch_bytes=64 * 1024, max_linger_ms=200)
+    yield exporter
+    BackgroundExporter.configure()
+
+
+def _record(i):
+    return ExportRecord(endpoint='http://localhost/api/v1/log/inference', payload={'i': i}, headers={})
+
+
+def test_records_are_sent_by_worker_threads(exporter, monkeypatch):
+    sent = []
+    done = threading.Event()
+
+    def fake_post(endpoint, payload, headers, data=None):
+        sent.append(json.loads(data)['i'])
+        if len(sent) == 3:
+            done.set()
+
+    monkeypatch.setattr(RequestHelper, 'make_post_request', staticmethod(fake_post))
+    for i in range(3):
+        assert exporter.submit(_record(i))
+
+    assert done.wait(timeout=5)
+    assert sent == [0, 1, 2]
+
+
+def test_submit_drops_when_queue_is_full(exporter, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(RequestHelper, 'make_post_request', staticmethod(lambda **kwargs: release.wait(timeout=5)))
+
+    accepted = [exporter.submit(_record(i)) for i in range(20)]
+    release.set()
+
+    # one record may be held by the worker, the rest fit in the queue
+    assert accepted.count(True) <= 5
+    assert exporter.dropped == accepted.count(False)
+
+
+def test_log_inference_does_not_spawn_threads(exporter, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(RequestHelper, 'make_post_request', staticmethod(lambda **kwargs: release.wait(timeout=5)))
+
+    InferenceLogger.log_inference(prompt='warm up', response='ok')
+    thread_count = threading.active_count()
+    for _ in range(100):
+        InferenceLogger.log_inference(prompt='hello', response='world')
+    release.set()
+
+    assert threading.active_count() == thread_count
+
+
+def test_inferences_are_coalesced_into_batches(batching_exporter, athina_server):
+    for i in range(25):
+        InferenceLogger.log_inference(prompt=f'prompt {i}', response=f'response {i}', prompt_slug='batching')
+
+    def all_received():
+        return sum(len(r['json']) for r in athina_server.requests_to('/api/v1/log/inference/batch')) == 25
+
+    assert athina_server.wait_for(all_received)
+    batches = athina_server.requests_to('/api/v1/log/inference/batch')
+    assert all(len(batch['json']) <= 10 for batch in batches)
+    assert len(batches) < 25
+    assert sorted(item['prompt'] for batch in batches for item in batch['json']) == sorted(f'prompt {i}' for i in range(25))
+    assert athina_server.requests_to('/api/v1/log/inference') == []
+
+
+def test_partial_batch_is_sent_after_linger_time(batching_exporter, athina_server):
+    InferenceLogger.log_inference(prompt='lonely', response='record')
+
+    assert athina_server.wait_for(lambda: len(athina_server.requests_to('/api/v1/log/inference/batch')) == 1, timeout=2)
+    assert athina_server.requests_to('/api/v1/log/inference/batch')[0]['json'][0]['prompt'] == 'lonely'
+
+
+def test_batches_respect_max_bytes(athina_server, monkeypatch):
+    monkeypatch.setattr(inference_logger, 'API_BASE_URL', athina_server.url)
+    BackgroundExporter.configure(num_workers=1, batching=True, max_batch_size=100, max_batch_bytes=1000, max_linger_ms=50)
+    try:
+        for i in range(10):
+            InferenceLogger.log_inference(prompt='x' * 300, response=str(i))
+
+        def all_received():
+            return sum(len(r['json']) for r in athina_server.requests_to('/api/v1/log/inference/batch')) == 10
+
+        assert athina_server.wait_for(all_received)
+        assert all(len(batch['json']) <= 3 for batch in athina_server.requests_to('/api/v1/log/inference/batch'))
+    finally:
+        BackgroundExporter.configure()
+
+
+def test_flush_sends_partial_batches_without_waiting_for_linger(athina_server, monkeypatch):
+    monkeypatch.setattr(inference_logger, 'API_BASE_URL', athina_server.url)
+    exporter = BackgroundExporter.configure(num_workers=2, batching=True, max_batch_size=100, max_linger_ms=60000)
+    try:
+        for i in range(7):
+            InferenceLogger.log_inference(prompt=f'prompt {i}', response='ok')
+
+        assert exporter.flush(timeout=5)
+        assert exporter.pending == 0
+        assert sum(len(r['json']) for r in athina_server.requests_to('/api/v1/log/inference/batch')) == 7
+    finally:
+        BackgroundExporter.configure()
+
+
+def test_shutdown_reports_records_it_could_not_send(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(RequestHelper, 'make_post_request', staticmethod(lambda **kwargs: release.wait(timeout=5)))
+    exporter = BackgroundExporter.configure(max_queue_size=100, num_workers=1)
+    try:
+        for i in range(10):
+            exporter.submit(_record(i))
+
+        assert exporter.flush(timeout=0.1) is False
+        assert exporter.shutdown(timeout=0.1) == 10
+        assert exporter.dropped == 10
+        assert exporter.submit(_record(10)) is False
+    finally:
+        release.set()
+        BackgroundExporter.configure()
+
+
+@pytest.fixture
+def stalled_sends(monkeypatch):
+    sent = []
+    release = threading.Event()
+
+    def fake_post(endpoint, payload, headers, data=None):
+        release.wait(timeout=5)
+        sent.append(json.loads(data)['i'])
+
+    monkeypatch.setattr(RequestHelper, 'make_post_request', staticmethod(fake_post))
+    yield sent, release
+    release.set()
+    BackgroundExporter.configure()
+
+
+def test_drop_oldest_policy_keeps_the_newest_records(stalled_sends):
+    sent, release = stalled_sends
+    exporter = BackgroundExporter.configure(max_queue_size=5, num_workers=1, overflow_policy='drop_oldest')
+
+    accepted = [exporter.submit(_record(i)) for i in range(50)]
+    release.set()
+
+    assert all(accepted)
+    assert exporter.flush(timeout=5)
+    assert sent[-5:] == [45, 46, 47, 48, 49]
+    assert exporter.stats()['dropped_overflow'] == 50 - len(sent)
+
+
+def test_block_policy_waits_then_drops(stalled_sends):
+    exporter = BackgroundExporter.configure(max_queue_size=2, num_workers=1, overflow_policy='block', block_timeout=0.05)
+
+    accepted = [exporter.submit(_record(i)) for i in range(5)]
+
+    assert accepted.count(False) >= 2
+    assert exporter.stats()['dropped_overflow'] == accepted.count(False)
+
+
+def test_block_policy_never_blocks_an_event_loop(stalled_sends):
+    exporter = BackgroundExporter.configure(max_queue_size=1, num_workers=1, overflow_policy='block', block_timeout=1)
+
+    async def main():
+        started = time.monotonic()
+        accepted = [exporter.submit(_record(i)) for i in range(5)]
+        return accepted, time.monotonic() - started
+
+    accepted, elapsed = asyncio.run(main())
+    stalled_sends[1].set()
+
+    assert exporter.flush(timeout=5)
+    assert elapsed < 0.5
+    assert accepted.count(False) >= 3
+    assert exporter.stats()['dropped_overflow'] == accepted.count(False)
+
+
+def test_sample_policy_sheds_load_above_the_high_watermark(stalled_sends):
+    exporter = BackgroundExporter.configure(
+        max_queue_size=1000, num_workers=1, overflow_policy='sample', sample_rate=0.0, sample_high_watermark=0.01)
+
+    accepted = [exporter.submit(_record(i)) for i in range(100)]
+
+    assert 10 <= accepted.count(True) <= 11
+    stats = exporter.stats()
+    assert stats['dropped_sampled'] == accepted.count(False)
+    assert stats['accepted'] == accepted.count(True)
+
+
+@pytest.mark.parametrize('overflow_policy, kept', [
+    ('drop_newest', [0, 1, 2, 3, 4]),
+    ('drop_oldest', [45, 46, 47, 48, 49]),
+])
+def test_async_sends_are_bounded_by_the_overflow_policy(overflow_policy, kept):
+    exporter = BackgroundExporter.configure(max_queue_size=5, overflow_policy=overflow_policy)
+    sent = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def send(i):
+            await release.wait()
+            sent.append(i)
+
+        for i in range(50):
+            exporter.schedule(send(i))
+        assert exporter.async_pending == 5
+        release.set()
+        assert await exporter.aflush(timeout=5)
+
+    try:
+        asyncio.run(main())
+        assert sorted(sent) == kept
+        stats = exporter.stats()
+        assert stats['dropped_overflow'] == 45
+        assert stats['dropped_shutdown'] == 0
+        assert stats['sent'] == 5
+    finally:
+        BackgroundExporter.configure()
+
+
+def test_unknown_overflow_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BackgroundExporter(overflow_policy='drop_everything')
@@ -0,0 +1,62 @@
+import pytest
+
+from athina_logger.exporter import BackgroundExporter
+from athina_logger.tracing import trace as trace_module
+from athina_logger.tracing.trace import Trace
+
+
+@pytest.fixture
+def exporter(athina_server, monkeypatch):
+    monkeypatch.setattr(trace_module, 'API_BASE_URL', athina_server.url)
+    monkeypatch.setattr(trace_module, 'TRACE_CHUNK_SPANS', 10)
+    exporter = BackgroundExporter.configure(num_workers=2)
+    yield exporter
+    BackgroundExporter.configure()
+
+
+def assemble_trace(athina_server, trace_id):
+    """
+    reassembles a trace uploaded incrementally, the way the api does: the chunks with
+    the trace's id, in sequence order, followed by the spans sent with the trace itself.
+    """
+    trace, = [r['json'] for r in athina_server.requests_to('/api/v1/trace/sdk') if r['json']['trace_id'] == trace_id]
+    chunks = sorted(
+        (r['json'] for r in athina_server.requests_to('/api/v1/trace/sdk/chunk') if r['json']['trace_id'] == trace_id),
+        key=lambda chunk: chunk['sequence'])
+    assert [chunk['sequence'] for chunk in chunks] == list(range(trace['chunk_count']))
+    return {**trace, 'spans': [span for chunk in chunks for span in chunk['spans']] + trace['spans']}
+
+
+def test_completed_spans_are_uploaded_in_chunks_and_released(exporter, athina_server):
+    trace = Trace(name='agent session', incremental_export=True)
+    for i in range(25):
+        step = trace.create_span(name=f'step {i}')
+        step.create_span(name='tool').end()
+        step.end()
+        # ended top-level spans are not kept by the trace once they are in a chunk
+        assert len(trace._spans) == 0
+        assert len(trace._completed_spans) <= 5
+    still_running = trace.create_span(name='still running')
+    trace.end()
+
+    assert exporter.flush(timeout=5)
+    assert len(athina_server.requests_to('/api/v1/trace/sdk/chunk')) == 5
+    uploaded = assemble_trace(athina_server, trace.trace_id)
+    assert uploaded['name'] == 'agent session'
+    assert [span['name'] for span in uploaded['spans']] == [f'step {i}' for i in range(25)] + ['still running']
+    assert all(span['children'][0]['name'] == 'tool' for span in uploaded['spans'][:25])
+    assert uploaded['spans'][-1]['end_time'] is not None
+    assert trace._spans == [] and still_running._span.end_time is not None
+
+
+def test_traces_are_uploaded_whole_by_default(exporter, athina_server):
+    trace = Trace(name='request')
+    for i in range(25):
+        trace.create_span(name=f'step {i}').end()
+    trace.end()
+
+    assert exporter.flush(timeout=5)
+    assert athina_server.requests_to('/api/v1/trace/sdk/chunk') == []
+    uploaded, = athina_server.requests_to('/api/v1/trace/sdk')
+    assert len(uploaded['json']['spans']) == 25
+    assert 'chunk_count' not in uploaded['json']
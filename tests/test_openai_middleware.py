@@ -0,0 +1,158 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+import pytest
+
+# importing the wrapper instruments the openai clients
+import athina_logger.openai_wrapper  # noqa: F401
+from athina_logger import inference_logger
+from athina_logger.athina_meta import AthinaMeta
+from athina_logger.exporter import BackgroundExporter
+
+
+@pytest.fixture
+def logged(athina_server, monkeypatch):
+    """
+    returns the logged inferences, keyed by prompt_slug, once the exporter is flushed
+    """
+    monkeypatch.setattr(inference_logger, 'API_BASE_URL', athina_server.url)
+
+    def logged():
+        assert BackgroundExporter.get_instance().flush(timeout=10)
+        return {request['json']['prompt_slug']: request['json'] for request in athina_server.requests_to('/api/v1/log/inference')}
+    return logged
+
+
+def test_async_clients_are_instrumented(openai_server, logged):
+    async def main():
+        client = openai.AsyncOpenAI(api_key='test', base_url=openai_server.url)
+
+        completion = await client.chat.completions.create(
+            model='gpt-4o', messages=[{'role': 'user', 'content': 'one two three'}],
+            athina_meta=AthinaMeta(prompt_slug='async'))
+        stream = await client.chat.completions.create(
+            model='gpt-4o', messages=[{'role': 'user', 'content': 'one two three'}], stream=True,
+            stream_options={'include_usage': True}, athina_meta=AthinaMeta(prompt_slug='async-stream'))
+        texts = [chunk.choices[0].delta.content async for chunk in stream if chunk.choices]
+        await client.close()
+        return completion, texts
+
+    completion, texts = asyncio.run(main())
+
+    assert completion.choices[0].message.content == 'three two one'
+    assert ''.join(text or '' for text in texts) == 'three two one'
+    records = logged()
+    assert records['async']['response']['choices'][0]['message']['content'] == 'three two one'
+    stream_record = records['async-stream']
+    assert stream_record['response']['choices'][0] == {
+        'index': 0, 'message': {'role': 'assistant', 'content': 'three two one'}, 'finish_reason': 'stop', 'logprobs': None}
+    assert stream_record['total_tokens'] == 4
+    assert 0 < stream_record['time_to_first_token'] <= stream_record['stream_duration']
+    assert set(stream_record['inter_chunk_latency']) == {'p50', 'p90', 'p99', 'max'}
+    assert stream_record['tokens_per_second'] > 0
+    assert 'time_to_first_token' not in records['async']
+
+
+def test_async_streams_keep_the_async_stream_interface(openai_server, logged):
+    async def main():
+        client = openai.AsyncOpenAI(api_key='test', base_url=openai_server.url)
+        messages = [{'role': 'user', 'content': 'one two three'}]
+        async with await client.chat.completions.create(
+                model='gpt-4o', messages=messages, stream=True, athina_meta=AthinaMeta(prompt_slug='with')) as stream:
+            assert stream.response.status_code == 200
+            texts = [chunk.choices[0].delta.content async for chunk in stream if chunk.choices]
+        closed = await client.chat.completions.create(
+            model='gpt-4o', messages=messages, stream=True, athina_meta=AthinaMeta(prompt_slug='closed'))
+        await closed.__anext__()
+        await closed.close()
+        await client.close()
+        return texts
+
+    texts = asyncio.run(main())
+
+    assert ''.join(text or '' for text in texts) == 'three two one'
+    records = logged()
+    assert records['with']['response']['choices'][0]['message']['content'] == 'three two one'
+    # a stream closed before its end is not logged
+    assert 'closed' not in records
+
+
+def test_concurrent_async_streams_are_logged_separately(openai_server, logged):
+    async def call(client, i):
+        stream = await client.chat.completions.create(
+            model='gpt-4o', messages=[{'role': 'user', 'content': f'a{i} b{i} c{i}'}], stream=True,
+            stream_options={'include_usage': True}, athina_meta=AthinaMeta(prompt_slug=f'call-{i}'))
+        async for _ in stream:
+            # let the other streams interleave with this one
+            await asyncio.sleep(0)
+
+    async def main():
+        client = openai.AsyncOpenAI(api_key='test', base_url=openai_server.url)
+        await asyncio.gather(*(call(client, i) for i in range(20)))
+        await client.close()
+
+    asyncio.run(main())
+
+    records = logged()
+    for i in range(20):
+        assert records[f'call-{i}']['response']['choices'][0]['message']['content'] == f'c{i} b{i} a{i}'
+        assert records[f'call-{i}']['prompt'] == [{'role': 'user', 'content': f'a{i} b{i} c{i}'}]
+
+
+def test_concurrent_calls_do_not_share_state(openai_server, logged):
+    clients = [openai.OpenAI(api_key='test', base_url=openai_server.url, max_retries=0) for _ in range(4)]
+
+    def call(i):
+        client = clients[i % len(clients)]
+        messages = [{'role': 'user', 'content': f'a{i} b{i} c{i} d{i}'}]
+        athina_meta = AthinaMeta(prompt_slug=f'call-{i}')
+        if i % 2:
+            return client.chat.completions.create(
+                model='gpt-4o', messages=messages, athina_meta=athina_meta).choices[0].message.content
+        stream = client.chat.completions.create(
+            model='gpt-4o', messages=messages, stream=True, stream_options={'include_usage': True},
+            athina_meta=athina_meta)
+        texts = []
+        for chunk in stream:
+            # hand over to the other threads between chunks, so the streams overlap
+            time.sleep(0.001)
+            if chunk.choices:
+                texts.append(chunk.choices[0].delta.content or '')
+        return ''.join(texts)
+
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        texts = list(pool.map(call, range(400)))
+    for client in clients:
+        client.close()
+
+    records = logged()
+    assert len(records) == 400
+    for i, text in enumerate(texts):
+        expected = f'd{i} c{i} b{i} a{i}'
+        record = records[f'call-{i}']
+        assert text == expected
+        assert record['prompt'] == [{'role': 'user', 'content': f'a{i} b{i} c{i} d{i}'}]
+        assert record['response']['choices'][0]['message']['content'] == expected
+        if i % 2 == 0:
+            assert record['total_tokens'] == 5
+            assert record['time_to_first_token'] <= record['stream_duration']
+
+
+def test_shared_athina_meta_is_not_changed(openai_server, athina_server, logged):
+    client = openai.OpenAI(api_key='test', base_url=openai_server.url, max_retries=0)
+    athina_meta = AthinaMeta(prompt_slug='shared', response_time=12345)
+    messages = [{'role': 'user', 'content': 'one two'}]
+
+    stream = client.chat.completions.create(model='gpt-4o', messages=messages, stream=True, athina_meta=athina_meta)
+    client.chat.completions.create(model='gpt-4o', messages=messages, athina_meta=athina_meta)
+    for _ in stream:
+        pass
+    client.close()
+
+    logged()
+    assert athina_meta.response_time == 12345
+    requests = athina_server.requests_to('/api/v1/log/inference')
+    assert len(requests) == 2
+    assert all(request['json']['response_time'] != 12345 for request in requests)
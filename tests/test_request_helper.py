@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from athina_logger import request_helper
+from athina_logger.constants import HTTP_CONNECT_TIMEOUT, HTTP_POOL_SIZE, HTTP_READ_TIMEOUT
+from athina_logger.exception.custom_exception import CustomException
+from athina_logger.request_helper import RequestHelper
+from athina_logger.retry_policy import RetryBudget, RetryPolicy
+
+
+def test_requests_reuse_pooled_connections(athina_server):
+    for i in range(5):
+        RequestHelper.make_post_request(endpoint=f'{athina_server.url}/api/v1/log/inference', payload={'i': i}, headers={})
+
+    client_ports = {request['client_address'][1] for request in athina_server.requests}
+    assert len(athina_server.requests) == 5
+    assert len(client_ports) == 1
+
+
+def test_threads_share_the_connection_pool(athina_server):
+    sessions = []
+
+    def post():
+        sessions.append(RequestHelper.get_session())
+        RequestHelper.make_patch_request(endpoint=f'{athina_server.url}/api/v1/prompt_run/user-feedback', payload={}, headers={})
+
+    threads = [threading.Thread(target=post) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(session) for session in sessions}) == 4
+    assert len({id(session.get_adapter('http://')) for session in sessions}) == 1
+    assert len(athina_server.requests_to('/api/v1/prompt_run/user-feedback')) == 4
+
+
+def test_configure_session_replaces_the_pool(athina_server):
+    session = RequestHelper.get_session()
+    RequestHelper.configure_session(pool_size=2, connect_timeout=1, read_timeout=2)
+    try:
+        new_session = RequestHelper.get_session()
+        assert new_session is not session
+        assert new_session.get_adapter('http://')._pool_maxsize == 2
+        assert RequestHelper._timeout == (1, 2)
+    finally:
+        RequestHelper.configure_session(
+            pool_size=HTTP_POOL_SIZE, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT)
+
+
+@pytest.fixture
+def retry_policy(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(request_helper.time, 'sleep', sleeps.append)
+    policy = RetryPolicy(max_attempts=3, base_delay=0.1, max_delay=1)
+    monkeypatch.setattr(RequestHelper, '_retry_policy', policy)
+    return policy, sleeps
+
+
+def test_transient_errors_are_retried_with_retry_after(athina_server, retry_policy):
+    _, sleeps = retry_policy
+    athina_server.responses = [(503, {'Retry-After': '2'}), (429, {})]
+
+    RequestHelper.make_post_request(endpoint=f'{athina_server.url}/api/v1/log/inference', payload={}, headers={})
+
+    assert len(athina_server.requests) == 3
+    assert sleeps[0] == 2
+    assert 0 <= sleeps[1] <= 0.2
+
+
+def test_permanent_errors_are_not_retried(athina_server, retry_policy):
+    athina_server.responses = [(400, {})]
+
+    with pytest.raises(CustomException) as e:
+        RequestHelper.make_post_request(endpoint=f'{athina_server.url}/api/v1/log/inference', payload={}, headers={})
+
+    assert e.value.status_code == 400
+    assert e.value.message == 'Mock Error: 400'
+    assert len(athina_server.requests) == 1
+
+
+def test_retries_stop_when_the_budget_is_exhausted(athina_server, retry_policy, monkeypatch):
+    policy, _ = retry_policy
+    policy.budget = RetryBudget(ratio=0, min_retries_per_second=0, max_tokens=1)
+    athina_server.status_code = 500
+
+    for _ in range(3):
+        with pytest.raises(CustomException):
+            RequestHelper.make_post_request(endpoint=f'{athina_server.url}/api/v1/log/inference', payload={}, headers={})
+
+    # one retry for the first request, none afterwards
+    assert len(athina_server.requests) == 4
+
+
+def test_backoff_is_exponential_with_full_jitter():
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.5, max_retry_after=10)
+
+    for attempt, cap in [(1, 0.1), (2, 0.2), (3, 0.4), (4, 0.5), (10, 0.5)]:
+        delays = [policy.backoff(attempt) for _ in range(50)]
+        assert all(0 <= delay <= cap for delay in delays)
+    assert policy.backoff(1, retry_after=60) == 10
+
+
+def test_parse_retry_after():
+    assert RetryPolicy.parse_retry_after('3') == 3
+    assert RetryPolicy.parse_retry_after(None) is None
+    assert RetryPolicy.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert RetryPolicy.parse_retry_after('soon') is None
@@ -0,0 +1,69 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from athina_logger import serializer
+from athina_logger.exporter import BackgroundExporter
+from athina_logger.serializer import JsonSerializer, OrjsonSerializer, create_serializer, set_serializer
+from athina_logger.tracing import trace as trace_module
+from athina_logger.tracing.trace import Trace
+
+
+class Document:
+    def __init__(self, text):
+        self.text = text
+
+
+SERIALIZERS = [
+    JsonSerializer,
+    pytest.param(OrjsonSerializer, marks=pytest.mark.skipif(serializer.orjson is None, reason='orjson is not installed')),
+]
+
+
+@pytest.mark.parametrize('serializer_class', SERIALIZERS)
+def test_non_serializable_leaves_use_the_default_hook(serializer_class):
+    payload = {'doc': Document('x'), 'price': Decimal('1.5'), 'tags': {'a'}, 'nested': [{'n': 1, 2: 'two'}]}
+
+    decoded = json.loads(serializer_class().dumps(payload))
+
+    assert decoded == {'doc': '<Document object>', 'price': '1.5', 'tags': ['a'], 'nested': [{'n': 1, '2': 'two'}]}
+
+
+@pytest.mark.parametrize('serializer_class', SERIALIZERS)
+def test_payloads_encode_to_bytes(serializer_class):
+    body = serializer_class().dumps({'prompt': 'héllo', 'tokens': 2 ** 70})
+
+    assert isinstance(body, bytes)
+    assert json.loads(body) == {'prompt': 'héllo', 'tokens': 2 ** 70}
+
+
+def test_unknown_serializer_is_rejected():
+    with pytest.raises(ValueError):
+        create_serializer('pickle')
+
+
+def test_custom_serializer_and_trace_with_custom_objects(athina_server, monkeypatch):
+    monkeypatch.setattr(trace_module, 'API_BASE_URL', athina_server.url)
+    encoded = []
+
+    class RecordingSerializer(JsonSerializer):
+        def dumps(self, obj):
+            body = super().dumps(obj)
+            encoded.append(body)
+            return body
+
+    set_serializer(RecordingSerializer())
+    exporter = BackgroundExporter.configure(num_workers=1)
+    try:
+        trace = Trace(name='custom objects')
+        trace.create_span(name='retrieval', output={'documents': [Document('a')]}).end()
+        trace.end()
+
+        assert exporter.flush(timeout=5)
+        uploaded, = athina_server.requests_to('/api/v1/trace/sdk')
+        assert uploaded['json']['spans'][0]['output'] == {'documents': ['<Document object>']}
+        assert len(encoded) == 1
+    finally:
+        set_serializer(None)
+        BackgroundExporter.configure()
@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+
+import pytest
+
+from athina_logger import inference_logger
+from athina_logger.exporter import BackgroundExporter, ExportRecord
+from athina_logger.inference_logger import InferenceLogger
+from athina_logger.request_helper import RequestHelper
+from athina_logger.retry_policy import RetryPolicy
+from athina_logger.spool import DiskSpool
+
+
+@pytest.fixture
+def no_retries(monkeypatch):
+    monkeypatch.setattr(RequestHelper, '_retry_policy', RetryPolicy(max_attempts=1))
+
+
+@pytest.fixture
+def spooling_exporter(tmp_path, athina_server, monkeypatch, no_retries):
+    monkeypatch.setattr(inference_logger, 'API_BASE_URL', athina_server.url)
+    spool = DiskSpool(str(tmp_path / 'spool'), fsync='never')
+    exporter = BackgroundExporter.configure(num_workers=1, spool=spool)
+    yield exporter, spool
+    BackgroundExporter.configure()
+
+
+def test_spool_hands_out_segments_oldest_first(tmp_path):
+    spool = DiskSpool(str(tmp_path), segment_bytes=200, fsync='always')
+    for i in range(6):
+        spool.append('http://localhost/a', {'h': 'v'}, json.dumps({'i': i}).encode('utf-8'))
+
+    seen = []
+    while True:
+        taken = spool.take_oldest()
+        if taken is None:
+            break
+        path, entries = taken
+        seen.extend(json.loads(entry['body'])['i'] for entry in entries)
+        spool.complete(path, [])
+
+    assert seen == list(range(6))
+    assert spool.size == 0
+    assert [name for name in os.listdir(spool.directory) if name.endswith('.spool')] == []
+
+
+def test_spool_keeps_remaining_entries_and_survives_reopening(tmp_path):
+    spool = DiskSpool(str(tmp_path), fsync='never')
+    for i in range(3):
+        spool.append('http://localhost/a', {}, json.dumps({'i': i}).encode('utf-8'))
+    path, entries = spool.take_oldest()
+    spool.complete(path, entries[1:])
+    spool.close()
+
+    reopened = DiskSpool(str(tmp_path), fsync='never')
+    _, entries = reopened.take_oldest()
+    assert [json.loads(entry['body'])['i'] for entry in entries] == [1, 2]
+    assert oct(os.stat(path).st_mode & 0o777) == oct(0o600)
+
+
+def test_spools_sharing_a_directory_use_their_own_segments(tmp_path):
+    first = DiskSpool(str(tmp_path), fsync='never')
+    second = DiskSpool(str(tmp_path), fsync='never')
+    first.append('http://localhost/a', {}, b'{"a": 1}')
+    second.append('http://localhost/a', {}, b'{"b": 2}')
+
+    assert first.directory != second.directory
+    path, entries = first.take_oldest()
+    assert [entry['body'] for entry in entries] == ['{"a": 1}']
+    first.complete(path, [])
+    second.append('http://localhost/a', {}, b'{"b": 3}')
+    path, entries = second.take_oldest()
+    assert [entry['body'] for entry in entries] == ['{"b": 2}', '{"b": 3}']
+    second.complete(path, [])
+    assert first.take_oldest() is None and second.take_oldest() is None
+
+
+def test_spool_of_a_closed_spool_is_claimed_again(tmp_path):
+    first = DiskSpool(str(tmp_path), fsync='never')
+    first.append('http://localhost/a', {}, b'{"a": 1}')
+    first.close()
+
+    reopened = DiskSpool(str(tmp_path), fsync='never')
+    assert reopened.directory == first.directory
+    _, entries = reopened.take_oldest()
+    assert [entry['body'] for entry in entries] == ['{"a": 1}']
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_forked_process_claims_its_own_directory(tmp_path):
+    spool = DiskSpool(str(tmp_path), fsync='never')
+    spool.append('http://localhost/a', {}, b'{"parent": 1}')
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        spool.append('http://localhost/a', {}, b'{"child": 1}')
+        os.write(write, spool.directory.encode('utf-8'))
+        os._exit(0)
+    os.waitpid(pid, 0)
+    child_directory = os.read(read, 1000).decode('utf-8')
+
+    assert child_directory != spool.directory
+    _, entries = spool.take_oldest()
+    assert [entry['body'] for entry in entries] == ['{"parent": 1}']
+
+
+def test_spool_evicts_the_oldest_segments_when_full(tmp_path):
+    spool = DiskSpool(str(tmp_path), max_bytes=1000, segment_bytes=300, fsync='never')
+    for i in range(50):
+        spool.append('http://localhost/a', {}, json.dumps({'i': i}).encode('utf-8'))
+
+    assert spool.size <= 1000
+    assert spool.evicted_segments > 0
+    _, entries = spool.take_oldest()
+    assert json.loads(entries[0]['body'])['i'] > 0
+
+
+def test_unknown_fsync_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        DiskSpool(str(tmp_path), fsync='sometimes')
+
+
+def test_failed_records_are_spooled_and_replayed(spooling_exporter, athina_server):
+    exporter, spool = spooling_exporter
+    athina_server.status_code = 503
+    for i in range(3):
+        InferenceLogger.log_inference(prompt=f'prompt {i}', response='ok')
+
+    assert exporter.flush(timeout=5)
+    assert exporter.stats()['spooled'] == 3
+    assert exporter.stats()['failed'] == 0
+
+    athina_server.status_code = 200
+    assert exporter.replay_spool() == 3
+    assert len(spool) == 0
+    # the first three requests are the failed sends
+    prompts = [r['json']['prompt'] for r in athina_server.requests_to('/api/v1/log/inference')]
+    assert prompts[3:] == ['prompt 0', 'prompt 1', 'prompt 2']
+
+
+def test_replay_stops_at_the_first_transient_failure(spooling_exporter, athina_server):
+    exporter, spool = spooling_exporter
+    athina_server.status_code = 503
+    for i in range(3):
+        InferenceLogger.log_inference(prompt=f'prompt {i}', response='ok')
+    assert exporter.flush(timeout=5)
+
+    athina_server.responses = [(200, {}), (503, {})]
+    assert exporter.replay_spool() == 1
+
+    athina_server.status_code = 200
+    assert exporter.replay_spool() == 2
+    prompts = [r['json']['prompt'] for r in athina_server.requests_to('/api/v1/log/inference')]
+    assert prompts[3:] == ['prompt 0', 'prompt 1', 'prompt 1', 'prompt 2']
+
+
+def test_permanent_failures_are_not_spooled(spooling_exporter, athina_server):
+    exporter, spool = spooling_exporter
+    athina_server.status_code = 400
+    InferenceLogger.log_inference(prompt='invalid', response='ok')
+
+    assert exporter.flush(timeout=5)
+    assert exporter.stats()['failed'] == 1
+    assert len(spool) == 0
+
+
+def test_shutdown_spools_records_it_could_not_send(tmp_path, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(RequestHelper, 'make_post_request', staticmethod(lambda **kwargs: release.wait(timeout=5)))
+    spool = DiskSpool(str(tmp_path), fsync='never')
+    exporter = BackgroundExporter.configure(max_queue_size=100, num_workers=1, spool=spool)
+    try:
+        for i in range(10):
+            exporter.submit(ExportRecord(endpoint='http://localhost/api/v1/log/inference', payload={'i': i}, headers={}))
+
+        exporter.shutdown(timeout=0.1)
+        # the record held by the worker is still in flight
+        assert exporter.stats()['spooled'] >= 9
+        _, entries = DiskSpool(str(tmp_path), fsync='never').take_oldest()
+        assert [json.loads(entry['body'])['i'] for entry in entries][-1] == 9
+    finally:
+        release.set()
+        BackgroundExporter.configure()
+
+
+def test_segments_deleted_from_outside_are_skipped(tmp_path):
+    spool = DiskSpool(str(tmp_path), segment_bytes=10, fsync='never')
+    spool.append('http://localhost/a', {}, b'{"a": 1}')
+    spool.append('http://localhost/a', {}, b'{"a": 2}')
+    spool.close()
+    spool = DiskSpool(str(tmp_path), segment_bytes=10, fsync='never')
+    os.remove(sorted(os.path.join(spool.directory, name) for name in os.listdir(spool.directory)
+                     if name.endswith('.spool'))[0])
+
+    _, entries = spool.take_oldest()
+    assert [entry['body'] for entry in entries] == ['{"a": 2}']
+
+
+def test_replay_errors_do_not_stop_the_worker(spooling_exporter, athina_server, monkeypatch, capsys):
+    exporter, spool = spooling_exporter
+    athina_server.status_code = 503
+    InferenceLogger.log_inference(prompt='spooled', response='ok')
+    assert exporter.flush(timeout=5)
+
+    def unreadable():
+        raise PermissionError('spool directory is not readable')
+    monkeypatch.setattr(spool, 'take_oldest', unreadable)
+    athina_server.status_code = 200
+    assert exporter.replay_spool() == 0
+    assert 'spool directory is not readable' in capsys.readouterr().out
+
+    monkeypatch.setattr('athina_logger.exporter.SPOOL_REPLAY_INTERVAL', 0)
+    for i in range(3):
+        InferenceLogger.log_inference(prompt=f'prompt {i}', response='ok')
+    assert exporter.flush(timeout=5)
+    assert all(worker.is_alive() for worker in exporter._workers)
+    prompts = [r['json']['prompt'] for r in athina_server.requests_to('/api/v1/log/inference')]
+    assert prompts[-3:] == ['prompt 0', 'prompt 1', 'prompt 2']
@@ -0,0 +1,73 @@
+import pytest
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from athina_logger.util.stream_assembler import StreamAssembler
+
+CHUNK = {'id': 'chatcmpl-1', 'object': 'chat.completion.chunk', 'created': 1, 'model': 'gpt-4o'}
+
+
+def _chunk(choices, **fields):
+    return {**CHUNK, 'choices': choices, **fields}
+
+
+def _tool_call_stream():
+    return [
+        _chunk([{'index': 0, 'delta': {'role': 'assistant', 'content': None, 'tool_calls': [
+            {'index': 0, 'id': 'call_a', 'type': 'function', 'function': {'name': 'get_weather', 'arguments': ''}},
+        ]}}], system_fingerprint='fp_1'),
+        _chunk([{'index': 0, 'delta': {'tool_calls': [{'index': 0, 'function': {'arguments': '{"city": '}}]}}]),
+        _chunk([{'index': 0, 'delta': {'tool_calls': [
+            {'index': 0, 'function': {'arguments': '"Paris"}'}},
+            {'index': 1, 'id': 'call_b', 'type': 'function', 'function': {'name': 'get_time', 'arguments': '{}'}},
+        ]}}]),
+        _chunk([{'index': 0, 'delta': {}, 'finish_reason': 'tool_calls'}]),
+        _chunk([], usage={'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15}),
+    ]
+
+
+@pytest.mark.parametrize('typed', [False, True])
+def test_tool_call_fragments_are_merged(typed):
+    assembler = StreamAssembler()
+    for chunk in _tool_call_stream():
+        assembler.add(ChatCompletionChunk.model_validate(chunk) if typed else chunk)
+
+    completion = assembler.completion()
+    assert completion['system_fingerprint'] == 'fp_1'
+    assert completion['usage']['total_tokens'] == 15
+    assert completion['choices'][0]['finish_reason'] == 'tool_calls'
+    assert completion['choices'][0]['message']['tool_calls'] == [
+        {'id': 'call_a', 'type': 'function', 'function': {'name': 'get_weather', 'arguments': '{"city": "Paris"}'}},
+        {'id': 'call_b', 'type': 'function', 'function': {'name': 'get_time', 'arguments': '{}'}},
+    ]
+    # the assembled completion is a valid non-streamed response
+    ChatCompletion.model_validate(completion)
+
+
+def test_choices_are_merged_per_index():
+    assembler = StreamAssembler()
+    for chunk in [
+        _chunk([{'index': 0, 'delta': {'role': 'assistant', 'content': 'Hel'}},
+                {'index': 1, 'delta': {'role': 'assistant', 'content': 'Bon'}}]),
+        _chunk([{'index': 1, 'delta': {'content': 'jour'}, 'finish_reason': 'stop'}]),
+        _chunk([{'index': 0, 'delta': {'content': 'lo'}, 'finish_reason': 'length',
+                 'logprobs': {'content': [{'token': 'lo', 'logprob': -0.1, 'bytes': None, 'top_logprobs': []}]}}]),
+    ]:
+        assembler.add(chunk)
+
+    choices = assembler.completion()['choices']
+    assert [choice['message']['content'] for choice in choices] == ['Hello', 'Bonjour']
+    assert [choice['finish_reason'] for choice in choices] == ['length', 'stop']
+    assert choices[0]['logprobs']['content'][0]['token'] == 'lo'
+    assert assembler.text == 'Hello' and assembler.finish_reason == 'length'
+
+
+def test_text_completion_streams():
+    assembler = StreamAssembler()
+    for text, finish_reason in (('Python is', None), (' a language', 'stop')):
+        assembler.add({'id': 'cmpl-1', 'object': 'text_completion', 'created': 1, 'model': 'gpt-3.5-turbo-instruct',
+                       'choices': [{'index': 0, 'text': text, 'finish_reason': finish_reason, 'logprobs': None}]})
+
+    completion = assembler.completion()
+    assert completion['object'] == 'text_completion'
+    assert completion['choices'][0]['text'] == 'Python is a language'
+    assert assembler.message() is None
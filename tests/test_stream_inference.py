@@ -0,0 +1,218 @@
+import threading
+import time
+
+import pytest
+from openai.types.chat import ChatCompletionChunk
+
+from athina_logger import inference_logger, openai_wrapper
+from athina_logger.athina_meta import AthinaMeta
+from athina_logger.exporter import BackgroundExporter
+from athina_logger.log_stream_inference.openai_chat_completion_stream import LogOpenAiChatCompletionStreamInference
+from athina_logger.log_stream_inference.openai_completion_stream import LogOpenAiCompletionStreamInference
+from athina_logger.util import token_count_helper
+from athina_logger.util.stream_assembler import TextBuffer
+
+PROMPT = [{'role': 'user', 'content': 'say hello'}]
+USAGE = {'prompt_tokens': 11, 'completion_tokens': 2, 'total_tokens': 13}
+
+
+def _chunks(texts, usage=None):
+    chunks = [
+        ChatCompletionChunk.model_validate({
+            'id': 'chatcmpl-1', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'gpt-4o',
+            'choices': [{'index': 0, 'delta': {'content': text}, 'finish_reason': None}],
+        })
+        for text in texts
+    ]
+    if usage is not None:
+        # with stream_options={'include_usage': True} the last chunk has no choices and reports the usage
+        chunks.append(ChatCompletionChunk.model_validate({
+            'id': 'chatcmpl-1', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'gpt-4o',
+            'choices': [], 'usage': usage,
+        }))
+    return chunks
+
+
+def _stream_call():
+    return openai_wrapper.OpenAiCall(
+        {'model': 'gpt-4o', 'messages': PROMPT, 'stream': True}, AthinaMeta(prompt_slug='stream'), time.perf_counter())
+
+
+@pytest.fixture
+def local_token_counts(athina_server, monkeypatch):
+    """
+    sends logs to the mock server and records the names of the threads that counted tokens
+    locally, with a stand-in for the tokenizer, which would otherwise download the encodings
+    """
+    monkeypatch.setattr(inference_logger, 'API_BASE_URL', athina_server.url)
+    threads = []
+
+    def count(**kwargs):
+        threads.append(threading.current_thread().name)
+        return 1
+
+    monkeypatch.setattr(token_count_helper, 'get_prompt_tokens_openai_chat_completion', count)
+    monkeypatch.setattr(token_count_helper, 'get_completion_tokens_openai_chat_completion', count)
+    return threads
+
+
+@pytest.mark.parametrize('usage, expected_tokens, expected_local_counts', [
+    (USAGE, USAGE, 0),
+    (None, {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}, 2),
+])
+def test_stream_inference_uses_reported_usage(athina_server, local_token_counts,
+                                              usage, expected_tokens, expected_local_counts):
+    logger = LogOpenAiChatCompletionStreamInference(prompt_slug='stream', prompt=PROMPT, language_model_id='gpt-4o')
+
+    logger.collect_stream_inference(_chunks(['hel', 'lo'], usage))
+    logger.log_stream_inference()
+    assert BackgroundExporter.get_instance().flush(timeout=5)
+
+    payload = athina_server.requests_to('/api/v1/log/inference')[0]['json']
+    assert payload['response']['choices'][0]['message'] == {'role': 'assistant', 'content': 'hello'}
+    assert {key: payload[key] for key in expected_tokens} == expected_tokens
+    assert len(local_token_counts) == expected_local_counts
+
+
+def test_middleware_uses_reported_usage(athina_server, local_token_counts):
+    call = _stream_call()
+
+    chunks = list(openai_wrapper.OpenAiMiddleware()._response_interceptor(iter(_chunks(['hel', 'lo'], USAGE)), call))
+    assert BackgroundExporter.get_instance().flush(timeout=5)
+
+    assert len(chunks) == 3
+    payload = athina_server.requests_to('/api/v1/log/inference')[0]['json']
+    assert payload['response']['object'] == 'chat.completion'
+    assert payload['response']['choices'][0]['message'] == {'role': 'assistant', 'content': 'hello'}
+    assert payload['total_tokens'] == 13
+    assert local_token_counts == []
+
+
+def test_middleware_counts_tokens_on_the_exporter(athina_server, local_token_counts):
+    list(openai_wrapper.OpenAiMiddleware()._response_interceptor(iter(_chunks(['hel', 'lo'])), _stream_call()))
+    assert BackgroundExporter.get_instance().flush(timeout=5)
+
+    payload = athina_server.requests_to('/api/v1/log/inference')[0]['json']
+    assert payload['total_tokens'] == 2
+    # derived on the exporter once the completion tokens are counted
+    assert payload['tokens_per_second'] > 0 and payload['time_to_first_token'] >= 0
+    assert len(local_token_counts) == 2
+    assert all(name.startswith('athina-exporter') for name in local_token_counts)
+
+
+def test_typed_chunks_are_read_without_dumping(monkeypatch):
+    chunks = _chunks(['hel', None, 'lo'], USAGE)
+    dict_chunks = [chunk.model_dump() for chunk in chunks]
+    monkeypatch.setattr(ChatCompletionChunk, 'model_dump', lambda self, **kwargs: pytest.fail('chunk was dumped'))
+
+    typed = LogOpenAiChatCompletionStreamInference(prompt_slug='stream', prompt=PROMPT, language_model_id='gpt-4o')
+    typed.collect_stream_inference(chunks)
+    dicts = LogOpenAiChatCompletionStreamInference(prompt_slug='stream', prompt=PROMPT, language_model_id='gpt-4o')
+    dicts.collect_stream_inference(dict_chunks)
+
+    assert typed.response == dicts.response == 'hello'
+    assert typed.usage == dicts.usage
+    assert {key: typed.usage[key] for key in USAGE} == USAGE
+
+
+def test_text_buffer_joins_fragments_once():
+    buffer = TextBuffer('a')
+    for fragment in ('b', None, '', 'c'):
+        buffer.append(fragment)
+
+    assert buffer.getvalue() == 'abc'
+    assert buffer._fragments == ['abc']
+    buffer.append('d')
+    assert buffer.getvalue() == 'abcd'
+
+
+def test_stream_inference_logs_tool_calls(athina_server, local_token_counts):
+    logger = LogOpenAiChatCompletionStreamInference(prompt_slug='stream', prompt=PROMPT, language_model_id='gpt-4o')
+    for arguments in ('{"city": ', '"Paris"}'):
+        logger.collect_stream_inference_by_chunk({'id': 'chatcmpl-1', 'model': 'gpt-4o', 'choices': [{
+            'index': 0, 'delta': {'tool_calls': [{'index': 0, 'id': 'call_a', 'function': {'name': 'get_weather', 'arguments': arguments}}]},
+        }]})
+    logger.log_stream_inference()
+    assert BackgroundExporter.get_instance().flush(timeout=5)
+
+    payload = athina_server.requests_to('/api/v1/log/inference')[0]['json']
+    assert payload['tool_calls'] == [
+        {'id': 'call_a', 'type': 'function', 'function': {'name': 'get_weather', 'arguments': '{"city": "Paris"}'}}]
+    assert logger.completion['choices'][0]['message']['tool_calls'] == payload['tool_calls']
+
+
+def test_stream_inference_response_can_be_reset():
+    logger = LogOpenAiChatCompletionStreamInference(prompt_slug='stream', prompt=PROMPT, language_model_id='gpt-4o')
+    logger.collect_stream_inference(_chunks(['hel', 'lo'], None))
+
+    logger.response = ''
+    assert logger.response == ''
+    logger.collect_stream_inference(_chunks(['wor', 'ld'], None))
+    assert logger.response == 'world'
+    logger.response += '!'
+    assert logger.completion['choices'][0]['message']['content'] == 'world!'
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """
+    the records handed to the exporter, with their payloads resolved only when read
+    """
+    records = []
+    monkeypatch.setattr(BackgroundExporter, 'submit', lambda self, record: records.append(record) or True)
+    return lambda: [record.payload() if callable(record.payload) else record.payload for record in records]
+
+
+def test_messages_appended_after_logging_are_not_logged(submitted, monkeypatch):
+    counted_prompts = []
+    monkeypatch.setattr(token_count_helper, 'get_prompt_tokens_openai_chat_completion',
+                        lambda prompt, language_model_id: counted_prompts.append(list(prompt)) or 1)
+    monkeypatch.setattr(token_count_helper, 'get_completion_tokens_openai_chat_completion', lambda **kwargs: 1)
+    messages = list(PROMPT)
+
+    logger = LogOpenAiChatCompletionStreamInference(prompt_slug='stream', prompt=messages, language_model_id='gpt-4o')
+    logger.collect_stream_inference(_chunks(['hel', 'lo']))
+    logger.log_stream_inference()
+    call = openai_wrapper.OpenAiCall(
+        {'model': 'gpt-4o', 'messages': messages, 'stream': True}, AthinaMeta(prompt_slug='stream'), time.perf_counter())
+    list(openai_wrapper.OpenAiMiddleware()._response_interceptor(iter(_chunks(['hel', 'lo'])), call))
+    inference_logger.InferenceLogger.log_inference(prompt=messages, response='hello')
+    # the usual chat loop, right after the call
+    messages.append({'role': 'assistant', 'content': 'hello'})
+
+    payloads = submitted()
+    assert [payload['prompt'] for payload in payloads] == [PROMPT] * 3
+    assert counted_prompts == [PROMPT] * 2
+
+
+def test_stream_inference_logs_the_assembled_completion(submitted):
+    chunks = [
+        {'id': 'chatcmpl-1', 'model': 'gpt-4o', 'created': 0, 'system_fingerprint': 'fp_1', 'choices': [
+            {'index': 0, 'delta': {'role': 'assistant', 'content': 'hi'}, 'finish_reason': None},
+            {'index': 1, 'delta': {'role': 'assistant', 'content': 'hey'}, 'finish_reason': None}]},
+        {'id': 'chatcmpl-1', 'choices': [
+            {'index': 0, 'delta': {}, 'finish_reason': 'stop'},
+            {'index': 1, 'delta': {}, 'finish_reason': 'length'}]},
+    ]
+    logger = LogOpenAiChatCompletionStreamInference(prompt_slug='stream', prompt=PROMPT, language_model_id='gpt-4o')
+    logger.collect_stream_inference(chunks)
+    logger.log_stream_inference()
+
+    response = submitted()[0]['response']
+    assert response['system_fingerprint'] == 'fp_1'
+    assert [(choice['message']['content'], choice['finish_reason']) for choice in response['choices']] == [
+        ('hi', 'stop'), ('hey', 'length')]
+
+
+def test_completion_stream_inference_logs_the_assembled_completion(submitted):
+    logger = LogOpenAiCompletionStreamInference(prompt_slug='stream', prompt='say', language_model_id='gpt-3.5-turbo-instruct')
+    logger.collect_stream_inference([
+        {'id': 'cmpl-1', 'choices': [{'index': 0, 'text': 'hel', 'finish_reason': None}]},
+        {'id': 'cmpl-1', 'choices': [{'index': 0, 'text': 'lo', 'finish_reason': 'stop'}]},
+    ])
+    logger.log_stream_inference()
+
+    response = submitted()[0]['response']
+    assert response['object'] == 'text_completion'
+    assert response['choices'][0]['text'] == 'hello'
+    assert response['choices'][0]['finish_reason'] == 'stop'
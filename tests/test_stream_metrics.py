@@ -0,0 +1,71 @@
+import pytest
+
+from athina_logger.log_stream_inference.openai_chat_completion_stream import LogOpenAiChatCompletionStreamInference
+from athina_logger.util import stream_metrics
+from athina_logger.util.stream_assembler import StreamAssembler
+from athina_logger.util.stream_metrics import StreamTimer, tokens_per_second
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    a manual perf_counter, in seconds
+    """
+    now = [100.0]
+    monkeypatch.setattr(stream_metrics.time, 'perf_counter', lambda: now[0])
+    return now
+
+
+def test_stream_timer(clock):
+    timer = StreamTimer()
+    assert timer.metrics() == {}
+
+    # first chunk after 250 ms, then 99 chunks 10 ms apart and one straggler 200 ms later
+    clock[0] += 0.25
+    timer.tick()
+    for _ in range(99):
+        clock[0] += 0.01
+        timer.tick()
+    clock[0] += 0.2
+    timer.tick()
+
+    metrics = timer.metrics()
+    assert metrics['time_to_first_token'] == 250
+    assert metrics['stream_duration'] == pytest.approx(250 + 990 + 200)
+    assert metrics['inter_chunk_latency']['p50'] == pytest.approx(10)
+    assert metrics['inter_chunk_latency']['p99'] == pytest.approx(10)
+    assert metrics['inter_chunk_latency']['max'] == pytest.approx(200)
+
+
+def test_assembler_times_chunks_from_the_request(clock):
+    assembler = StreamAssembler(started_at=clock[0] - 1)
+    clock[0] += 0.5
+    assembler.add({'choices': [{'index': 0, 'delta': {'content': 'hi'}}]})
+    # the usage chunk has no choices and is not timed
+    clock[0] += 5
+    assembler.add({'choices': [], 'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}})
+
+    assert assembler.metrics() == {'time_to_first_token': 1500, 'stream_duration': 1500}
+
+
+def test_stream_logger_times_chunks_from_request_started_at(clock):
+    request_started_at = clock[0]
+    # the logger is created once the request returned
+    clock[0] += 2
+    logger = LogOpenAiChatCompletionStreamInference(
+        prompt_slug='stream', prompt=[], language_model_id='gpt-4o', request_started_at=request_started_at)
+    clock[0] += 0.5
+    logger.collect_stream_inference_by_chunk({'choices': [{'index': 0, 'delta': {'content': 'hi'}}]})
+
+    assert logger.stream_metrics['time_to_first_token'] == 2500
+
+
+@pytest.mark.parametrize('completion_tokens, time_to_first_token, stream_duration, expected', [
+    (100, 500, 2500, 49.5),
+    (100, 500, 500, 200),
+    (1, 500, 500, 2),
+    (None, 500, 2500, None),
+    (100, None, None, None),
+])
+def test_tokens_per_second(completion_tokens, time_to_first_token, stream_duration, expected):
+    assert tokens_per_second(completion_tokens, time_to_first_token, stream_duration) == expected
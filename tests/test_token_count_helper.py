@@ -0,0 +1,94 @@
+import pytest
+
+from athina_logger.util import token_count_helper
+from athina_logger.util.token_count_helper import (
+    get_completion_tokens_openai_chat_completion,
+    get_encoding_name,
+    get_prompt_tokens_openai_chat_completion,
+    get_token_usage_openai_completion,
+)
+
+
+@pytest.mark.parametrize('language_model_id, encoding_name', [
+    ('gpt-5', 'o200k_base'),
+    ('gpt-5-mini-2025-08-07', 'o200k_base'),
+    ('gpt-5.1', 'o200k_base'),
+    ('gpt-oss-120b', 'o200k_base'),
+    ('chatgpt-4o-latest', 'o200k_base'),
+    ('gpt-4o', 'o200k_base'),
+    ('gpt-4o-mini-2024-07-18', 'o200k_base'),
+    ('gpt-4.1-nano', 'o200k_base'),
+    ('o3-mini', 'o200k_base'),
+    ('o4-mini', 'o200k_base'),
+    ('gpt-4-0613', 'cl100k_base'),
+    ('gpt-4-turbo', 'cl100k_base'),
+    ('ft:gpt-3.5-turbo-0125:acme::abc', 'cl100k_base'),
+    ('text-davinci-003', 'p50k_base'),
+    ('claude-3-opus', None),
+])
+def test_model_families_resolve_to_their_encoding(language_model_id, encoding_name):
+    assert get_encoding_name(language_model_id) == encoding_name
+
+
+def test_encodings_are_loaded_once_per_model(byte_encodings):
+    prompt = [{'role': 'user', 'content': 'hello'}, {'role': 'assistant', 'content': 'hi', 'name': 'bot'}]
+
+    for _ in range(3):
+        # 3 per message, the bytes of every value, 1 for the name and 3 to prime the reply
+        assert get_prompt_tokens_openai_chat_completion(prompt, 'gpt-4o') == 3 + 4 + 5 + 3 + 9 + 2 + 3 + 1 + 3
+        assert get_completion_tokens_openai_chat_completion('hello', 'gpt-4o') == 5
+
+    assert byte_encodings == ['o200k_base']
+    assert token_count_helper.get_encoding.cache_info().hits >= 5
+
+
+def test_unknown_models(byte_encodings):
+    with pytest.raises(ValueError):
+        get_prompt_tokens_openai_chat_completion([{'role': 'user', 'content': 'hi'}], 'claude-3-opus')
+    assert get_token_usage_openai_completion('hi', 'claude-3-opus') is None
+
+
+def test_large_prompts_are_counted_in_one_batch(byte_encodings, monkeypatch):
+    prompt = [{'role': 'user', 'content': f'message {i} ' * 100} for i in range(10)]
+    expected = get_prompt_tokens_openai_chat_completion(prompt, 'gpt-4o')
+    encoding = token_count_helper.get_encoding('gpt-4o')
+    batches = []
+    encode_ordinary_batch = encoding.encode_ordinary_batch
+    monkeypatch.setattr(token_count_helper, 'TOKEN_COUNT_BATCH_MIN_CHARS', 1000)
+    monkeypatch.setattr(encoding, 'encode_ordinary_batch',
+                        lambda texts, **kwargs: batches.append(texts) or encode_ordinary_batch(texts, **kwargs))
+    token_count_helper.message_token_cache.clear()
+
+    assert get_prompt_tokens_openai_chat_completion(prompt, 'gpt-4o') == expected
+    assert len(batches) == 1 and len(batches[0]) == 20
+
+
+def test_messages_of_earlier_turns_are_not_tokenized_again(byte_encodings, monkeypatch):
+    encoding = token_count_helper.get_encoding('gpt-4o')
+    encoded = []
+    encode_ordinary = encoding.encode_ordinary
+    monkeypatch.setattr(encoding, 'encode_ordinary', lambda text: encoded.append(text) or encode_ordinary(text))
+
+    session = [{'role': 'system', 'content': 'be brief'}]
+    get_prompt_tokens_openai_chat_completion(session, 'gpt-4o')
+    for turn in range(5):
+        session.append({'role': 'user', 'content': f'question {turn}'})
+        encoded.clear()
+        tokens = get_prompt_tokens_openai_chat_completion(session, 'gpt-4o')
+
+        # only the values of the new message were encoded
+        assert encoded == ['user', f'question {turn}']
+        token_count_helper.message_token_cache.clear()
+        assert get_prompt_tokens_openai_chat_completion(session, 'gpt-4o') == tokens
+        session.append({'role': 'assistant', 'content': f'answer {turn}', 'name': 'bot'})
+        get_prompt_tokens_openai_chat_completion(session, 'gpt-4o')
+
+
+def test_message_token_cache_is_bounded():
+    cache = token_count_helper.MessageTokenCache(maxsize=2)
+    for i in range(3):
+        cache.put(('o200k_base', bytes([i])), i)
+
+    assert len(cache) == 2
+    assert cache.get(('o200k_base', bytes([0]))) is None
+    assert cache.get(('o200k_base', bytes([2]))) == 2
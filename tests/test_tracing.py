@@ -0,0 +1,144 @@
+import datetime
+import threading
+import time
+
+from athina_logger.exporter import BackgroundExporter
+from athina_logger.tracing import trace as trace_module
+from athina_logger.tracing.span import Span
+from athina_logger.tracing.trace import Trace
+from athina_logger.tracing.util import normalize, remove_none_values, sanitize_dict
+
+
+class Retriever:
+    pass
+
+
+def _build_trace():
+    trace = Trace(name='agent', input={'question': 'why?'})
+    step = trace.create_span(name='step', attributes={'model': None, 'tags': ('a', None)})
+    step.create_span(name='retrieval', output={'documents': ['doc a', None, 'doc b'], 'retriever': Retriever()})
+    step.create_generation(name='llm', prompt=[{'role': 'user', 'content': 'why?'}], response='because', prompt_tokens=3)
+    return trace
+
+
+def test_normalize_matches_remove_none_values_and_sanitize_dict():
+    value = {
+        'a': None,
+        'b': [1, None, {'c': None, 'd': 'x'}],
+        'e': {'f': Retriever(), 'g': (1, None)},
+        'h': {'i': [True, 1.5]},
+    }
+
+    assert normalize(value) == sanitize_dict(remove_none_values(value))
+
+
+def test_normalize_shares_unchanged_containers():
+    clean = {'documents': ['doc a', 'doc b'], 'scores': {'a': 1}}
+    value = {'dirty': None, 'clean': clean}
+
+    normalized = normalize(value)
+
+    assert normalized == {'clean': clean}
+    assert normalized['clean'] is clean
+    assert normalize(clean) is clean
+
+
+def test_trace_export_matches_the_previous_three_pass_path():
+    trace = _build_trace()
+
+    assert trace._export_dict() == sanitize_dict(remove_none_values(trace.to_dict()))
+
+
+def test_trace_end_serializes_on_the_exporter_thread(athina_server, monkeypatch):
+    monkeypatch.setattr(trace_module, 'API_BASE_URL', athina_server.url)
+    exporting_threads = []
+    export_span = Span._export_dict
+
+    def recording_export(span):
+        exporting_threads.append(threading.current_thread())
+        return export_span(span)
+
+    monkeypatch.setattr(Span, '_export_dict', recording_export)
+    exporter = BackgroundExporter.configure(num_workers=1)
+    try:
+        trace = _build_trace()
+        trace.end()
+        # changes after end() are not part of the exported trace
+        trace.create_span(name='late')
+
+        assert exporter.flush(timeout=5)
+        uploaded, = athina_server.requests_to('/api/v1/trace/sdk')
+        assert [span['name'] for span in uploaded['json']['spans']] == ['step']
+        assert uploaded['json']['spans'][0]['children'][0]['end_time'] is not None
+        assert exporting_threads and threading.current_thread() not in exporting_threads
+    finally:
+        BackgroundExporter.configure()
+
+
+def test_span_records_allocate_dicts_lazily():
+    trace = Trace(name='lazy')
+    span = trace.create_span(name='tool')
+
+    assert span._span._attributes is None and span._span._input is None
+    assert span.to_dict()['attributes'] == {}
+    span._span.attributes['error'] = 'boom'
+    assert span._span.to_model().attributes == {'error': 'boom'}
+
+
+def test_generation_update_keeps_previous_attributes():
+    trace = Trace(name='generation')
+    generation = trace.create_generation(name='llm', prompt='hello', language_model_id='gpt-4o')
+    generation.update(response='world', prompt_tokens=1)
+
+    assert generation._export_dict()['attributes'] == {
+        'prompt': 'hello', 'language_model_id': 'gpt-4o', 'response': 'world', 'prompt_tokens': 1}
+
+
+def test_span_durations_use_the_monotonic_clock(monkeypatch):
+    trace = Trace(name='timing')
+    span = trace.create_span(name='step')
+    monkeypatch.setattr(time, 'perf_counter_ns', lambda: span._span.start_ns + 2_500_000)
+
+    span.end()
+
+    assert span._span.duration == 2
+    assert span._span.end_time - span._span.start_time == datetime.timedelta(microseconds=2500)
+    exported = span._export_dict()
+    assert datetime.datetime.fromisoformat(exported['end_time']) == span._span.end_time
+
+
+def test_explicit_times_use_the_wall_clock():
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    trace = Trace(name='timing', start_time=start)
+    span = trace.create_span(name='step', start_time=start)
+
+    span.end(start + datetime.timedelta(seconds=90))
+
+    assert span._span.duration == 90000
+    assert span._export_dict()['start_time'] == '2024-01-01T00:00:00+00:00'
+
+
+def test_spans_do_not_share_the_callers_dicts():
+    attributes = {'tool': 'search'}
+    trace = Trace(name='shared')
+    failed = trace.create_span(name='step', attributes=attributes, input={'query': 'a'})
+    failed._span.attributes['error'] = 'boom'
+    failed.update(attributes={'retries': 1})
+    generation = trace.create_generation(name='llm', attributes=attributes, prompt='hello')
+
+    assert attributes == {'tool': 'search'}
+    assert trace.create_span(name='step', attributes=attributes)._export_dict()['attributes'] == {'tool': 'search'}
+    assert generation._export_dict()['attributes'] == {'tool': 'search', 'prompt': 'hello'}
+
+
+def test_open_spans_end_when_the_trace_ends_not_when_it_is_exported():
+    trace = Trace(name='timing')
+    trace.create_span(name='step', start_time=datetime.datetime.now(datetime.timezone.utc))
+
+    build_payload = trace._freeze()
+    # the exporter builds the payload later
+    time.sleep(0.3)
+    payload = build_payload()
+
+    assert payload['duration'] < 300
+    assert payload['spans'][0]['duration'] < 300